@@ -27,11 +27,16 @@ http://opensource.org/licenses/BSD-3-Clause
 
 Details on EUROCONTROL: http://www.eurocontrol.int
 """
+import collections.abc
 import enum
+import functools
+import operator
+import sys
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, List, TypeVar, Dict, Union, Any
+from types import MappingProxyType
+from typing import Optional, List, TypeVar, Dict, Union, Any, Iterable, Sequence, Mapping, Tuple
 
-from rest_client import BaseModel
 
 __author__ = "EUROCONTROL (SWIM)"
 
@@ -49,7 +54,116 @@ class PositionSource(enum.Enum):
     FLARM = 3
 
 
-class StateVector(BaseModel):
+# number of values of a state vector in the OpenSky wire layout, any further one is kept as is in StateVector
+_STATE_VECTOR_WIRE_LENGTH = 17
+
+# the PositionSource members by their value, which is what OpenSky sends
+_POSITION_SOURCES = {position_source.value: position_source for position_source in PositionSource}
+_POSITION_SOURCE_VALUES = {position_source: position_source.value for position_source in PositionSource}
+
+
+def _compile_from_json(cls: type, json_keys_to_attributes: Iterable[Tuple]) -> classmethod:
+    """
+    Generates the source of a `from_json` classmethod specialized to the given (json key, attribute name) pairs and
+    compiles it, i.e. for the pairs [("firstSeen", "first_seen")] it builds:
+
+        def from_json(cls, object_dict):
+            obj = cls.__new__(cls)
+            obj.first_seen = object_dict['firstSeen']
+            return obj
+
+    The instance is created without going through __init__ and every attribute is assigned by straight-line code,
+    which avoids packing and binding the constructor arguments for each deserialized object. A model class can be
+    given as third item of a pair, i.e. ("position", "position", Position), in which case the value is deserialized
+    with its `from_json`.
+    """
+    namespace = {}
+    lines = ["def from_json(cls, object_dict):",
+             "    obj = cls.__new__(cls)"]
+    for json_key, attribute, *model in json_keys_to_attributes:
+        value = f"object_dict[{json_key!r}]"
+        if model:
+            namespace[model[0].__name__] = model[0]
+            value = f"{model[0].__name__}.from_json({value})"
+
+        lines.append(f"    obj.{attribute} = {value}")
+    lines.append("    return obj")
+
+    exec(compile("\n".join(lines), f"<{cls.__name__}.from_json>", "exec"), namespace)
+
+    return classmethod(namespace['from_json'])
+
+
+def _json_model(json_keys_to_attributes: Iterable[Tuple]):
+    """
+    Class decorator attaching a `from_json` generated by `_compile_from_json` for the given schema.
+    """
+    def decorator(cls):
+        cls.from_json = _compile_from_json(cls, json_keys_to_attributes)
+        return cls
+
+    return decorator
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return value if value is None else sys.intern(value)
+
+
+def _own_slots(cls: type) -> Tuple[str, ...]:
+    """
+    :return: the slots declared by the class itself, not by its bases
+    """
+    slots = vars(cls).get('__slots__', ())
+    if isinstance(slots, str):
+        slots = (slots,)
+
+    return tuple(name for name in slots if name not in ('__dict__', '__weakref__'))
+
+
+class _SlottedModel:
+    """
+    Base class of the models that keep their attributes in __slots__ instead of a per instance __dict__.
+
+    It provides the interface of rest_client.BaseModel (from_json/to_json and equality) without deriving from it:
+    BaseModel has no __slots__, so every instance of a subclass would still carry a __dict__ and no memory would be
+    saved. As a consequence the models are not instances of BaseModel. Equality is computed over the slot values of
+    the whole class hierarchy. Dataclass subclasses use their generated __eq__.
+    """
+    __slots__ = ()
+
+    # slots caching values derived from the other ones, which are left out of the comparison
+    _cache_slots = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cache_slots = {name for klass in cls.__mro__ for name in vars(klass).get('_cache_slots', ())}
+        compared_slots = [name for klass in reversed(cls.__mro__) for name in _own_slots(klass)
+                          if name not in cache_slots]
+
+        if compared_slots:
+            cls._slot_values = staticmethod(operator.attrgetter(*compared_slots))
+        else:
+            cls._slot_values = staticmethod(lambda obj: ())
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self._slot_values(self) == other._slot_values(other)
+
+    # a python level __ne__ would be called for every comparison, the builtin one inverts __eq__ in C
+    __ne__ = object.__ne__
+
+    @classmethod
+    def from_json(cls, object_dict):
+        raise NotImplementedError
+
+    def to_json(self):
+        raise NotImplementedError
+
+
+class StateVector(_SlottedModel):
+    __slots__ = ('icao24', 'callsign', 'origin_country', 'time_position_in_sec', 'last_contact_in_sec', 'longitude',
+                 'latitude', 'baro_altitude_in_m', 'on_ground', 'velocity_in_m_per_sec', 'true_track',
+                 'vertical_rate_in_m_per_sec', 'sensors', 'geo_altitude_in_m', 'squawk', 'spi', 'position_source',
+                 '_rest_args')
 
     def __init__(self,
                  icao24: str,
@@ -68,8 +182,7 @@ class StateVector(BaseModel):
                  geo_altitude_in_m: Optional[float],
                  squawk: Optional[str],
                  spi: bool,
-                 position_source: PositionSource,
-                 *args) -> None:
+                 position_source: Union[PositionSource, int]) -> None:
         """
         Represents the state of a vehicle at a particular time
 
@@ -97,11 +210,12 @@ class StateVector(BaseModel):
         :param squawk: transponder code aka Squawk. Can be None
         :param spi: special purpose indicator
         :param position_source: origin of this state's position: 0 = ADS-B, 1 = ASTERIX, 2 = MLAT,
-                                3 = FLARM
+                                3 = FLARM. The integer sent by OpenSky is converted to PositionSource.
         """
-        self.icao24 = icao24
-        self.callsign = callsign
-        self.origin_country = origin_country
+        # these strings repeat heavily within and across responses, so share a single copy of each value
+        self.icao24 = _intern(icao24)
+        self.callsign = _intern(callsign)
+        self.origin_country = _intern(origin_country)
         self.time_position_in_sec = time_position_in_sec
         self.last_contact_in_sec = last_contact_in_sec
         self.longitude = longitude
@@ -113,32 +227,196 @@ class StateVector(BaseModel):
         self.vertical_rate_in_m_per_sec = vertical_rate_in_m_per_sec
         self.sensors = sensors
         self.geo_altitude_in_m = geo_altitude_in_m
-        self.squawk = squawk
+        self.squawk = _intern(squawk)
         self.spi = spi
-        self.position_source = position_source
-        self._rest_args = args
+        # a dict lookup is much cheaper than the value lookup of PositionSource(position_source). A PositionSource,
+        # a missing position source or a value unknown to PositionSource is kept as is.
+        self.position_source = _POSITION_SOURCES.get(position_source, position_source)
+        self._rest_args = ()
 
     @classmethod
     def from_json(cls, state_vector_list: List[StateVectorData]):
         """
+        The 17 values of a row are passed positionally to __init__. Only a longer row, i.e. with the aircraft category
+        of extended responses, is sliced: its trailing values are kept in `_rest_args`.
+
         :param state_vector_list:
         :return: StateVector
         """
+        if len(state_vector_list) > _STATE_VECTOR_WIRE_LENGTH:
+            state_vector = cls(*state_vector_list[:_STATE_VECTOR_WIRE_LENGTH])
+            state_vector._rest_args = tuple(state_vector_list[_STATE_VECTOR_WIRE_LENGTH:])
+
+            return state_vector
+
         return cls(*state_vector_list)
 
 
-class States(BaseModel):
+@functools.lru_cache(maxsize=None)
+def _import_numpy():
+    """
+    numpy is an optional dependency only needed by the array paths, so it is imported on first use rather than along
+    with the models.
+
+    :return: the numpy module or None if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+
+    return numpy
+
+
+# the fields of the state vector numpy arrays as (name, dtype) pairs
+_STATE_VECTOR_FIELDS = (
+    ('icao24', 'U6'),
+    ('callsign', 'U8'),
+    ('origin_country', 'U64'),
+    ('time_position_in_sec', 'f8'),
+    ('last_contact_in_sec', 'i8'),
+    ('longitude', 'f8'),
+    ('latitude', 'f8'),
+    ('baro_altitude_in_m', 'f8'),
+    ('on_ground', '?'),
+    ('velocity_in_m_per_sec', 'f8'),
+    ('true_track', 'f8'),
+    ('vertical_rate_in_m_per_sec', 'f8'),
+    ('geo_altitude_in_m', 'f8'),
+    ('squawk', 'U4'),
+    ('spi', '?'),
+    ('position_source', 'i1'),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _state_vector_dtype() -> 'np.dtype':
+    return _import_numpy().dtype(list(_STATE_VECTOR_FIELDS))
+
+
+# the position of each _STATE_VECTOR_FIELDS field in the OpenSky wire layout (12 is the sensors)
+_STATE_VECTOR_WIRE_INDEXES = (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 14, 15, 16)
+
+
+def _to_state_vector_columns(state_vector_lists: Iterable[Sequence[StateVectorData]],
+                             names: Optional[Sequence[str]] = None) -> Dict[str, 'np.ndarray']:
+    """
+    Loads state vectors given in the OpenSky wire layout, i.e. 17 values per state vector, in one contiguous numpy
+    array per field. The rows are transposed once with zip and every column is then converted by a single np.array
+    call. Missing numeric values become NaN, missing strings become empty strings and a missing position source
+    becomes -1. The sensors are left out.
+
+    :param state_vector_lists:
+    :param names: the fields to load. All of them if omitted.
+    """
+    np = _import_numpy()
+    if np is None:
+        raise ImportError("numpy is required in order to handle the state vectors as arrays")
+
+    state_vector_dtype = _state_vector_dtype()
+    columns = list(zip(*state_vector_lists))
+
+    arrays = {}
+    for name, wire_index in zip(state_vector_dtype.names, _STATE_VECTOR_WIRE_INDEXES):
+        if names is not None and name not in names:
+            continue
+
+        dtype = state_vector_dtype[name]
+        column = columns[wire_index] if columns else ()
+
+        if dtype.kind == 'U':
+            column = [value or '' for value in column]
+        elif name == 'position_source':
+            column = [-1 if value is None else _POSITION_SOURCE_VALUES.get(value, value) for value in column]
+
+        arrays[name] = np.array(column, dtype=dtype)
+
+    return arrays
+
+
+def _to_state_vector_array(state_vector_lists: Iterable[Sequence[StateVectorData]]) -> 'np.ndarray':
+    """
+    Same as `_to_state_vector_columns` but the columns are gathered in a numpy structured array.
+    """
+    columns = _to_state_vector_columns(state_vector_lists)
+
+    array = _import_numpy().empty(len(columns['icao24']), dtype=_state_vector_dtype())
+    for name, column in columns.items():
+        array[name] = column
+
+    return array
+
+
+class _LazyStateVectors(collections.abc.Sequence):
+    """
+    Read-only sequence of StateVector over the raw state vector lists of a response. Each StateVector is created on
+    first access and kept for the subsequent ones, so that consumers touching a few aircraft of a large response do not
+    pay for all of them. The raw row of a StateVector is released once it has been created.
+    """
+    __slots__ = ('_state_vector_lists', '_state_vectors')
+
+    def __init__(self, state_vector_lists: List[Sequence[StateVectorData]]) -> None:
+        """
+        :param state_vector_lists: the raw rows. The list is owned by the sequence, which overwrites its items.
+        """
+        self._state_vector_lists = state_vector_lists
+        self._state_vectors = [None] * len(state_vector_lists)
+
+    def __len__(self) -> int:
+        return len(self._state_vectors)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(map(self.__getitem__, range(*index.indices(len(self)))))
+
+        state_vector = self._state_vectors[index]
+        if state_vector is None:
+            state_vector = self._state_vectors[index] = StateVector.from_json(self._state_vector_lists[index])
+            # the raw row is not needed anymore, so that each row is held in memory in one form only
+            self._state_vector_lists[index] = None
+
+        return state_vector
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, _LazyStateVectors)):
+            return NotImplemented
+
+        return len(self) == len(other) and all(map(operator.eq, self, other))
+
+    __hash__ = None
 
-    def __init__(self, time_in_sec: int, states: List[StateVector]) -> None:
+    def __repr__(self):
+        return repr(list(self))
+
+
+class States(_SlottedModel):
+    __slots__ = ('time_in_sec', 'states', '_time')
+    _cache_slots = ('_time',)
+
+    def __init__(self, time_in_sec: int, states: Sequence[StateVector]) -> None:
         """
         Represents the state of the airspace as seen by OpenSky at a particular time.
         :param time_in_sec: time since Unix epoch
-        :param states:
+        :param states: the state vectors. When deserialized from json the StateVector objects are created on access.
         """
         self.time_in_sec = time_in_sec
         self.states = states
 
-        self.time = datetime.fromtimestamp(time_in_sec)
+        self._time = None
+
+    @property
+    def time(self) -> datetime:
+        """
+        time_in_sec as a datetime. It is computed on first access since most callers only need time_in_sec, and again
+        only if time_in_sec has been changed since.
+        """
+        if self._time is None or self._time[0] != self.time_in_sec:
+            self._time = (self.time_in_sec, datetime.fromtimestamp(self.time_in_sec))
+
+        return self._time[1]
 
     @classmethod
     def from_json(cls, states_dict: Dict[str, StateVectorData]):
@@ -147,127 +425,276 @@ class States(BaseModel):
         :param states_dict:
         :return: States
         """
+        # OpenSky sends null instead of an empty list if no aircraft matches the query. The rows are copied in a list
+        # for O(1) indexing whatever iterable they come in.
+        state_vector_lists = list(states_dict['states'] or ())
+
         return cls(
             time_in_sec=states_dict['time'],
-            states=[
-                StateVector.from_json(state_vector_list)
-                for state_vector_list in states_dict['states']
-            ]
+            states=_LazyStateVectors(state_vector_lists)
         )
 
+    @classmethod
+    def array_from_json(cls, states_dict: Dict[str, StateVectorData]) -> 'np.ndarray':
+        """
+        Alternative to `from_json` for analytics over large responses: the state vectors are loaded in a single numpy
+        structured array (one field per StateVector attribute, sensors excluded) without creating any StateVector
+        object. Requires numpy.
 
-class FlightConnection(BaseModel):
+        :param states_dict:
+        :return: np.ndarray
+        """
+        return _to_state_vector_array(states_dict['states'] or ())
 
-    def __init__(self,
-                 icao24: str,
-                 first_seen: int,
-                 est_departure_airport: Optional[str],
-                 last_seen: int,
-                 est_arrival_airport: Optional[str],
-                 callsign: Optional[str],
-                 est_departure_airport_horiz_distance: Optional[int],
-                 est_departure_airport_vert_distance: Optional[int],
-                 est_arrival_airport_horiz_distance: int,
-                 est_arrival_airport_vert_distance: int,
-                 departure_airport_candidates_count: int,
-                 arrival_airport_candidates_count: int) -> None:
+    def as_arrays(self) -> Dict[str, 'np.ndarray']:
         """
-        Represents a flight departure or arrival for a certain airport.
-
-        :param icao24: Unique ICAO 24-bit address of the transponder in hex string representation. All letters are lower
-                       case.
-        :param first_seen: Estimated time of departure for the flight as Unix time (seconds since epoch).
-        :param est_departure_airport: ICAO code of the estimated departure airport. Can be null if the airport could not
-                                      be identified.
-        :param last_seen: Estimated time of arrival for the flight as Unix time (seconds since epoch)
-        :param est_arrival_airport: ICAO code of the estimated arrival airport. Can be null if the airport could not be
-                                    identified.
-        :param callsign: Callsign of the vehicle (8 chars). Can be null if no callsign has been received. If the vehicle
-                         transmits multiple callsigns during the flight, we take the one seen most frequently
-        :param est_departure_airport_horiz_distance: Horizontal distance of the last received airborne position to the
-                                                     estimated departure airport in meters
-        :param est_departure_airport_vert_distance: Vertical distance of the last received airborne position to the
-                                                    estimated departure airport in meters
-        :param est_arrival_airport_horiz_distance: Horizontal distance of the last received airborne position to the
-                                                   estimated arrival airport in meters
-        :param est_arrival_airport_vert_distance: Vertical distance of the last received airborne position to the
-                                                  estimated arrival airport in meters
-        :param departure_airport_candidates_count: Number of other possible departure airports. These are airports in
-                                                   short distance to estDepartureAirport.
-        :param arrival_airport_candidates_count: Number of other possible departure airports. These are airports in
-                                                 short distance to estArrivalAirport.
+        Provides the state vectors in columnar form for vectorized processing. Requires numpy.
+
+        :return: a contiguous 1-D numpy array per StateVector attribute (sensors excluded), keyed by the attribute name
         """
-        self.icao24 = icao24
-        self.first_seen = first_seen
-        self.est_departure_airport = est_departure_airport
-        self.last_seen = last_seen
-        self.est_arrival_airport = est_arrival_airport
-        self.callsign = callsign
-        self.est_departure_airport_horiz_distance = est_departure_airport_horiz_distance
-        self.est_departure_airport_vert_distance = est_departure_airport_vert_distance
-        self.est_arrival_airport_horiz_distance = est_arrival_airport_horiz_distance
-        self.est_arrival_airport_vert_distance = est_arrival_airport_vert_distance
-        self.departure_airport_candidates_count = departure_airport_candidates_count
-        self.arrival_airport_candidates_count = arrival_airport_candidates_count
+        return _to_state_vector_columns(self._state_vector_rows())
 
-    @classmethod
-    def from_json(cls, arrival_dict: Dict[str, FlightConnectionData]):
-        return cls(
-            icao24=arrival_dict["icao24"],
-            first_seen=arrival_dict["firstSeen"],
-            est_departure_airport=arrival_dict["estDepartureAirport"],
-            last_seen=arrival_dict["lastSeen"],
-            est_arrival_airport=arrival_dict["estArrivalAirport"],
-            callsign=arrival_dict["callsign"],
-            est_departure_airport_horiz_distance=arrival_dict["estDepartureAirportHorizDistance"],
-            est_departure_airport_vert_distance=arrival_dict["estDepartureAirportVertDistance"],
-            est_arrival_airport_horiz_distance=arrival_dict["estArrivalAirportHorizDistance"],
-            est_arrival_airport_vert_distance=arrival_dict["estArrivalAirportVertDistance"],
-            departure_airport_candidates_count=arrival_dict["departureAirportCandidatesCount"],
-            arrival_airport_candidates_count=arrival_dict["arrivalAirportCandidatesCount"]
-        )
+    def filter_bbox(self, bbox: 'BoundingBox') -> 'States':
+        """
+        Vectorized filtering of the state vectors by position, instead of testing them one by one in python. Positions
+        are compared as numpy arrays, see `BoundingBox.contains_mask`. Requires numpy.
 
+        :param bbox: the area to keep the state vectors of
+        :return: a new States with the state vectors lying within the bounding box
+        """
+        raw_rows = self._has_raw_rows()
+        rows = self._state_vector_rows()
+        columns = _to_state_vector_columns(rows, names=('latitude', 'longitude'))
+        indexes = _import_numpy().flatnonzero(bbox.contains_mask(columns['latitude'], columns['longitude'])).tolist()
 
-class BoundingBox(BaseModel):
+        if raw_rows:
+            states = _LazyStateVectors(list(map(rows.__getitem__, indexes)))
+        else:
+            states = list(map(self.states.__getitem__, indexes))
+
+        return States(time_in_sec=self.time_in_sec, states=states)
+
+    def _has_raw_rows(self) -> bool:
+        """
+        :return: whether the state vectors are still the raw rows of the response, i.e. no StateVector has been created,
+                 and therefore modified, yet.
+        """
+        return isinstance(self.states, _LazyStateVectors) and not any(self.states._state_vectors)
+
+    def _state_vector_rows(self) -> Sequence[Sequence[StateVectorData]]:
+        """
+        :return: the state vectors in the wire layout
+        """
+        if self._has_raw_rows():
+            return self.states._state_vector_lists
+
+        return list(map(StateVector._slot_values, self.states))
+
+
+# (json key, attribute name) pairs of FlightConnection
+_FLIGHT_CONNECTION_FIELDS = (
+    ("icao24", "icao24"),
+    ("firstSeen", "first_seen"),
+    ("estDepartureAirport", "est_departure_airport"),
+    ("lastSeen", "last_seen"),
+    ("estArrivalAirport", "est_arrival_airport"),
+    ("callsign", "callsign"),
+    ("estDepartureAirportHorizDistance", "est_departure_airport_horiz_distance"),
+    ("estDepartureAirportVertDistance", "est_departure_airport_vert_distance"),
+    ("estArrivalAirportHorizDistance", "est_arrival_airport_horiz_distance"),
+    ("estArrivalAirportVertDistance", "est_arrival_airport_vert_distance"),
+    ("departureAirportCandidatesCount", "departure_airport_candidates_count"),
+    ("arrivalAirportCandidatesCount", "arrival_airport_candidates_count"),
+)
+
+
+@_json_model(_FLIGHT_CONNECTION_FIELDS)
+@dataclass
+class FlightConnection(_SlottedModel):
+    """
+    Represents a flight departure or arrival for a certain airport.
+
+    :param icao24: Unique ICAO 24-bit address of the transponder in hex string representation. All letters are lower
+                   case.
+    :param first_seen: Estimated time of departure for the flight as Unix time (seconds since epoch).
+    :param est_departure_airport: ICAO code of the estimated departure airport. Can be null if the airport could not
+                                  be identified.
+    :param last_seen: Estimated time of arrival for the flight as Unix time (seconds since epoch)
+    :param est_arrival_airport: ICAO code of the estimated arrival airport. Can be null if the airport could not be
+                                identified.
+    :param callsign: Callsign of the vehicle (8 chars). Can be null if no callsign has been received. If the vehicle
+                     transmits multiple callsigns during the flight, we take the one seen most frequently
+    :param est_departure_airport_horiz_distance: Horizontal distance of the last received airborne position to the
+                                                 estimated departure airport in meters
+    :param est_departure_airport_vert_distance: Vertical distance of the last received airborne position to the
+                                                estimated departure airport in meters
+    :param est_arrival_airport_horiz_distance: Horizontal distance of the last received airborne position to the
+                                               estimated arrival airport in meters
+    :param est_arrival_airport_vert_distance: Vertical distance of the last received airborne position to the
+                                              estimated arrival airport in meters
+    :param departure_airport_candidates_count: Number of other possible departure airports. These are airports in
+                                               short distance to estDepartureAirport.
+    :param arrival_airport_candidates_count: Number of other possible departure airports. These are airports in
+                                             short distance to estArrivalAirport.
+    """
+    __slots__ = ('icao24', 'first_seen', 'est_departure_airport', 'last_seen', 'est_arrival_airport', 'callsign',
+                 'est_departure_airport_horiz_distance', 'est_departure_airport_vert_distance',
+                 'est_arrival_airport_horiz_distance', 'est_arrival_airport_vert_distance',
+                 'departure_airport_candidates_count', 'arrival_airport_candidates_count')
+
+    icao24: str
+    first_seen: int
+    est_departure_airport: Optional[str]
+    last_seen: int
+    est_arrival_airport: Optional[str]
+    callsign: Optional[str]
+    est_departure_airport_horiz_distance: Optional[int]
+    est_departure_airport_vert_distance: Optional[int]
+    est_arrival_airport_horiz_distance: int
+    est_arrival_airport_vert_distance: int
+    departure_airport_candidates_count: int
+    arrival_airport_candidates_count: int
+
+
+@functools.lru_cache(maxsize=None)
+def _bounding_box_mask_kernel():
+    """
+    Importing numba takes far longer than the rest of the package, so it is imported and the kernel is defined on the
+    first call of `BoundingBox.contains_mask` only.
+
+    :return: the compiled point in box kernel or None if numba is not installed
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:  # numba is an optional dependency
+        return None
+
+    np = _import_numpy()
+
+    @njit(parallel=True, cache=True)
+    def _bounding_box_mask(latitudes, longitudes, lamin, lamax, lomin, lomax):
+        mask = np.empty(latitudes.size, np.bool_)
+        for i in prange(latitudes.size):
+            mask[i] = lamin <= latitudes[i] <= lamax and lomin <= longitudes[i] <= lomax
+
+        return mask
+
+    return _bounding_box_mask
+
+
+@dataclass(frozen=True, init=False)
+class BoundingBox(_SlottedModel):
+    """
+    Represents a bounding box of WGS84 coordinates
+
+    :param lamin: lower bound for the latitude in decimal degrees
+    :param lamax: upper bound for the latitude in decimal degrees
+    :param lomin: lower bound for the longitude in decimal degrees
+    :param lomax: upper bound for the longitude in decimal degrees
+    """
+    __slots__ = ('lamin', 'lamax', 'lomin', 'lomax', '_json')
+    _cache_slots = ('_json',)
+
+    lamin: float
+    lamax: float
+    lomin: float
+    lomax: float
 
     def __init__(self, lamin: float, lamax: float, lomin: float, lomax: float) -> None:
+        if not (-90.0 <= lamin <= lamax <= 90.0 and -180.0 <= lomin <= lomax <= 180.0):
+            # invalid input is the uncommon case: only then find out which bound is wrong for a precise error
+            self._validate_lat(lamin)
+            self._validate_lat(lamax)
+            self._validate_lon(lomin)
+            self._validate_lon(lomax)
+            raise ValueError(f"Invalid bounding box. lamin ({lamin}) must not exceed lamax ({lamax}) "
+                             f"and lomin ({lomin}) must not exceed lomax ({lomax})")
+
+        # the frozen __setattr__ is bypassed with the slot setters, which are much cheaper than object.__setattr__
+        _set_lamin(self, lamin)
+        _set_lamax(self, lamax)
+        _set_lomin(self, lomin)
+        _set_lomax(self, lomax)
+        _set_json(self, None)
+
+    def __getstate__(self) -> Tuple[float, float, float, float]:
+        # the json mapping is left out: it is rebuilt on demand and a MappingProxyType cannot be pickled
+        return self.lamin, self.lamax, self.lomin, self.lomax
+
+    def __setstate__(self, state: Tuple[float, float, float, float]) -> None:
+        # the default slot state restore goes through the frozen __setattr__, which rejects it
+        lamin, lamax, lomin, lomax = state
+
+        _set_lamin(self, lamin)
+        _set_lamax(self, lamax)
+        _set_lomin(self, lomin)
+        _set_lomax(self, lomax)
+        _set_json(self, None)
+
+    def to_json(self) -> Mapping[str, float]:
         """
-        Represents a bounding box of WGS84 coordinates
+        The box is immutable, so the mapping is built on first call only and then reused.
 
-        :param lamin: lower bound for the latitude in decimal degrees
-        :param lamax: upper bound for the latitude in decimal degrees
-        :param lomin: lower bound for the longitude in decimal degrees
-        :param lomax: upper bound for the longitude in decimal degrees
+        :return: a read-only mapping of the bounds keyed by their query parameter name
         """
-        self.lamin = self._validate_lat(lamin)
-        self.lamax = self._validate_lat(lamax)
-        self.lomin = self._validate_lon(lomin)
-        self.lomax = self._validate_lon(lomax)
-
-    def to_json(self) -> Dict[str, float]:
-        return {
-            "lamin": self.lamin,
-            "lamax": self.lamax,
-            "lomin": self.lomin,
-            "lomax": self.lomax
-        }
+        if self._json is None:
+            _set_json(self, MappingProxyType({
+                "lamin": self.lamin,
+                "lamax": self.lamax,
+                "lomin": self.lomin,
+                "lomax": self.lomax
+            }))
+
+        return self._json
+
+    def contains_mask(self, latitudes: 'np.ndarray', longitudes: 'np.ndarray') -> 'np.ndarray':
+        """
+        Vectorized version of the point in box test, i.e. over the columns returned by `States.as_arrays`. Positions
+        with NaN coordinates are considered to be outside of the box. Requires numpy and uses a compiled numba kernel
+        if numba is installed.
+
+        :param latitudes: 1-D array of latitudes in decimal degrees
+        :param longitudes: 1-D array of longitudes in decimal degrees
+        :return: 1-D boolean array, True for the positions lying within the bounding box
+        """
+        np = _import_numpy()
+        if np is None:
+            raise ImportError("numpy is required in order to filter arrays of positions")
+
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        bounding_box_mask = _bounding_box_mask_kernel()
+        if bounding_box_mask is not None:
+            return bounding_box_mask(latitudes, longitudes, float(self.lamin), float(self.lamax),
+                                     float(self.lomin), float(self.lomax))
+
+        return (latitudes >= self.lamin) & (latitudes <= self.lamax) & \
+               (longitudes >= self.lomin) & (longitudes <= self.lomax)
 
     @staticmethod
-    def _validate_lat(lat):
+    def _validate_lat(lat) -> None:
         if lat < -90 or lat > 90:
             raise ValueError(f"Invalid latitude {lat}. Must be in [-90, 90]")
 
-        return lat
-
     @staticmethod
-    def _validate_lon(lon):
+    def _validate_lon(lon) -> None:
         if lon < -180 or lon > 180:
             raise ValueError(f"Invalid longitude {lon}. Must be in [-180, 180]")
 
-        return lon
 
+_set_lamin, _set_lamax, _set_lomin, _set_lomax, _set_json = (vars(BoundingBox)[name].__set__
+                                                             for name in BoundingBox.__slots__)
 
-class Position(BaseModel):
+
+@_json_model((
+    ("longitude", "longitude"),
+    ("latitude", "latitude"),
+    ("altitude", "altitude"),
+    ("reasonable", "reasonable"),
+))
+class Position(_SlottedModel):
+    __slots__ = ('longitude', 'latitude', 'altitude', 'reasonable')
 
     def __init__(self, longitude: float, latitude: float, altitude: float, reasonable: bool):
         """
@@ -282,22 +709,25 @@ class Position(BaseModel):
         self.altitude = altitude
         self.reasonable = reasonable
 
-    @classmethod
-    def from_json(cls, position_dict: Dict[str, Union[str, float, bool, None]]):
-        """
-
-        :param position_dict:
-        :return: Position
-        """
-        return cls(
-            longitude=position_dict["longitude"],
-            latitude=position_dict["latitude"],
-            altitude=position_dict["altitude"],
-            reasonable=position_dict["reasonable"]
-        )
-
 
-class Airport(BaseModel):
+@_json_model((
+    ("icao", "icao"),
+    ("iata", "iata"),
+    ("name", "name"),
+    ("city", "city"),
+    ("type", "type"),
+    ("position", "position", Position),
+    ("continent", "continent"),
+    ("country", "country"),
+    ("region", "region"),
+    ("municipality", "municipality"),
+    ("gpsCode", "gpsCode"),
+    ("homepage", "homepage"),
+    ("wikipedia", "wikipedia"),
+))
+class Airport(_SlottedModel):
+    __slots__ = ('icao', 'iata', 'name', 'city', 'type', 'position', 'continent', 'country', 'region', 'municipality',
+                 'gpsCode', 'homepage', 'wikipedia')
 
     def __init__(self,
                  icao: str,
@@ -343,21 +773,3 @@ class Airport(BaseModel):
         self.gpsCode=gpsCode
         self.homepage=homepage
         self.wikipedia=wikipedia
-
-    @classmethod
-    def from_json(cls, airport_dict):
-        return cls(
-            icao=airport_dict["icao"],
-            iata=airport_dict["iata"],
-            name=airport_dict["name"],
-            city=airport_dict["city"],
-            type=airport_dict["type"],
-            position=Position.from_json(airport_dict["position"]),
-            continent=airport_dict["continent"],
-            country=airport_dict["country"],
-            region=airport_dict["region"],
-            municipality=airport_dict["municipality"],
-            gpsCode=airport_dict["gpsCode"],
-            homepage=airport_dict["homepage"],
-            wikipedia=airport_dict["wikipedia"]
-        )
@@ -28,20 +28,62 @@ http://opensource.org/licenses/BSD-3-Clause
 Details on EUROCONTROL: http://www.eurocontrol.int
 """
 
+import calendar
+import math
+import time
 import typing as t
+from collections import OrderedDict
 from datetime import datetime
-
+from types import MappingProxyType
+
+import orjson
+try:
+    import simdjson
+except ImportError:  # pysimdjson is an optional dependency
+    simdjson = None
+try:
+    import ijson
+except ImportError:  # ijson is an optional dependency
+    ijson = None
 from rest_client import Requestor, ClientFactory
+from rest_client.errors import APIError
 from rest_client.typing import RequestHandler
-from opensky_network_client.models import States, BoundingBox, FlightConnection, Airport
+from opensky_network_client.models import States, StateVector, BoundingBox, FlightConnection, Airport
 
 __author__ = "EUROCONTROL (SWIM)"
 
 Timestamp = t.TypeVar('Timestamp', int, datetime)
 ICAO24 = t.Union[str, t.List[str]]
 
+_SUCCESS_STATUS_CODES = frozenset({200, 201, 204})
+
+# shared read-only default for GET requests without query parameters (requests never mutates the params it is given)
+_EMPTY_PARAMS = MappingProxyType({})
+
+# number of flight arrival/departure responses kept per client
+_FLIGHT_CONNECTIONS_CACHE_SIZE = 128
+
+
+def _to_epoch(timestamp: Timestamp) -> int:
+    """
+    Converts a datetime to Unix time. Timezone aware datetimes, preferably in UTC, are converted with calendar.timegm
+    which avoids the local timezone lookup of datetime.timestamp(). Naive datetimes are still taken as local time.
+
+    :param timestamp: seconds since epoch or datetime
+    """
+    if type(timestamp) is int or not isinstance(timestamp, datetime):
+        return timestamp
+
+    if timestamp.utcoffset() is None:
+        return math.trunc(timestamp.timestamp())
 
-class OpenskyNetworkClient(Requestor, ClientFactory):
+    return calendar.timegm(timestamp.utctimetuple())
+
+
+class _BaseOpenskyNetworkClient(Requestor, ClientFactory):
+    """
+    The queries shared by the synchronous and the asynchronous clients.
+    """
     def __init__(self, request_handler: RequestHandler) -> None:
         """
         :param request_handler: an instance of an object capable of handling http requests, i.e. requests.session()
@@ -54,32 +96,109 @@ class OpenskyNetworkClient(Requestor, ClientFactory):
         self._url_flights_departure = 'api/flights/departure/'
         self._url_airport = 'api/airports/'
 
+        self._request_dispatch = {
+            'GET': self._get,
+            'POST': self._post,
+            'PUT': self._put,
+            'DELETE': self._delete,
+        }
+
+    def perform_request(self,
+                        method: str,
+                        url: str,
+                        extra_params: t.Optional[t.Dict[str, t.Any]] = None,
+                        json: t.Optional[t.Dict[str, t.Any]] = None,
+                        response_class: t.Optional[type] = None,
+                        many: t.Optional[bool] = False) -> t.Any:
+        """
+        Overrides Requestor.perform_request in order to decode the response body with orjson instead of the stdlib
+        json module behind `response.json()`. orjson parses the raw bytes directly and skips the intermediate utf-8
+        decode, which matters for the multi-MB payloads of the states endpoint.
+
+        If pysimdjson is installed, the bulky States and FlightConnection responses are parsed by it instead. The
+        resulting document is converted to python lists and dicts in one go before it is handed to the models, since
+        its proxies would keep the whole document and the parser alive for as long as the models exist.
+
+        :param method: the HTTP method, i.e. GET, POST, PUT or DELETE
+        :param url: the path of the endpoint
+        :param extra_params: query parameters of the request
+        :param json: body of the request
+        :param response_class: the model the response is deserialized to. The decoded json is returned if omitted.
+        :param many: whether the response is a list of `response_class` objects
+        """
+        response = self._send_request(method, url, extra_params, json)
+
+        return self._process_response(response, response_class, many)
+
+    def _send_request(self,
+                      method: str,
+                      url: str,
+                      extra_params: t.Optional[t.Dict[str, t.Any]],
+                      json: t.Optional[t.Dict[str, t.Any]]):
+        try:
+            send_request = self._request_dispatch[method]
+        except KeyError:
+            raise NotImplementedError(f"Method {method} is not supported")
+
+        return send_request(url, extra_params, json)
+
+    @staticmethod
+    def _process_response(response, response_class: t.Optional[type], many: bool) -> t.Any:
+        if response.status_code not in _SUCCESS_STATUS_CODES:
+            raise APIError.from_response(response)
+
+        content = response.content
+
+        if not content:
+            result = None
+        elif simdjson is not None and response_class in (States, FlightConnection):
+            result = simdjson.Parser().parse(content)
+
+            if isinstance(result, simdjson.Array):
+                result = result.as_list()
+            elif isinstance(result, simdjson.Object):
+                result = result.as_dict()
+        else:
+            result = orjson.loads(content)
+
+        if response_class is None or result is None:
+            return result
+
+        if many:
+            return list(map(response_class.from_json, result))
+
+        return response_class.from_json(result)
+
+    def _get(self, url: str, extra_params: t.Optional[t.Dict[str, t.Any]], json: t.Optional[t.Dict[str, t.Any]]):
+        return self._request_handler.get(url,
+                                         params=extra_params if extra_params is not None else _EMPTY_PARAMS,
+                                         json=json)
+
+    def _post(self, url: str, extra_params: t.Optional[t.Dict[str, t.Any]], json: t.Optional[t.Dict[str, t.Any]]):
+        return self._request_handler.post(url, json=json)
+
+    def _put(self, url: str, extra_params: t.Optional[t.Dict[str, t.Any]], json: t.Optional[t.Dict[str, t.Any]]):
+        return self._request_handler.put(url, json=json)
+
+    def _delete(self, url: str, extra_params: t.Optional[t.Dict[str, t.Any]], json: t.Optional[t.Dict[str, t.Any]]):
+        return self._request_handler.delete(url)
+
     def get_states(self,
                    timestamp: Timestamp = 0,
                    icao24: t.Optional[ICAO24] = None,
                    bbox: t.Optional[BoundingBox] = None,
                    json: t.Optional[bool] = False) -> States:
         """
-        :param timestamp: the time in seconds since Unix epoch or datetime. Current time will be used if omitted.
+        :param timestamp: the time in seconds since Unix epoch or datetime, preferably timezone aware in UTC. Current
+                          time will be used if omitted.
         :param icao24: one or more ICAO24 transponder addresses represented by a hex string (e.g. abc9f3). If omitted,
                        the state vectors of all aircraft are returned.
         :param bbox: a bounding box of WGS84 coordinates to query a certain area
         """
-        if isinstance(timestamp, datetime):
-            timestamp = int(timestamp.timestamp())
-
         kwargs = {
-            'extra_params': {
-                "time": timestamp,
-            }
+            'extra_params': self._prepare_states_parameters(timestamp, icao24, bbox)
         }
 
-        if icao24 is not None:
-            kwargs['extra_params'].update({"icao24": icao24})
-
-        if bbox is not None:
-            kwargs['extra_params'].update(bbox.to_json())
-
         if not json:
             kwargs.update({'response_class': States})
 
@@ -94,20 +213,13 @@ class OpenskyNetworkClient(Requestor, ClientFactory):
                             json: t.Optional[bool] = False) -> t.List[FlightConnection]:
         """
         :param airport: ICAO identier for the airport
-        :param begin: Start of time interval to retrieve flights for as Unix time (seconds since epoch) or datetime
-        :param end: End of time interval to retrieve flights for as Unix time (seconds since epoch) or datetime
+        :param begin: Start of time interval to retrieve flights for as Unix time (seconds since epoch) or datetime,
+                      preferably timezone aware in UTC
+        :param end: End of time interval to retrieve flights for as Unix time (seconds since epoch) or datetime,
+                    preferably timezone aware in UTC
         """
-        kwargs = {
-            'extra_params': self._prepare_flight_connection_parameters(airport, begin, end),
-            'many': True
-        }
-
-        if not json:
-            kwargs.update({'response_class': FlightConnection})
-
-        response = self.perform_request('GET', self._url_flights_arrival, **kwargs)
-
-        return response
+        return self._get_flight_connections(self._url_flights_arrival, airport, _to_epoch(begin), _to_epoch(end),
+                                            bool(json))
 
     def get_flight_departures(self,
                               airport: str,
@@ -116,20 +228,13 @@ class OpenskyNetworkClient(Requestor, ClientFactory):
                               json: t.Optional[bool] = False) -> t.List[FlightConnection]:
         """
         :param airport: ICAO identier for the airport
-        :param begin: Start of time interval to retrieve flights for as Unix time (seconds since epoch) or datetime
-        :param end: End of time interval to retrieve flights for as Unix time (seconds since epoch) or datetime
+        :param begin: Start of time interval to retrieve flights for as Unix time (seconds since epoch) or datetime,
+                      preferably timezone aware in UTC
+        :param end: End of time interval to retrieve flights for as Unix time (seconds since epoch) or datetime,
+                    preferably timezone aware in UTC
         """
-        kwargs = {
-            'extra_params': self._prepare_flight_connection_parameters(airport, begin, end),
-            'many': True
-        }
-
-        if not json:
-            kwargs.update({'response_class': FlightConnection})
-
-        response = self.perform_request('GET', self._url_flights_departure, **kwargs)
-
-        return response
+        return self._get_flight_connections(self._url_flights_departure, airport, _to_epoch(begin), _to_epoch(end),
+                                            bool(json))
 
     def get_airport(self, icao: str, json: t.Optional[bool] = False) -> Airport:
         """
@@ -149,17 +254,268 @@ class OpenskyNetworkClient(Requestor, ClientFactory):
         return response
 
     @staticmethod
-    def _prepare_flight_connection_parameters(airport: str,
-                                              begin: Timestamp,
-                                              end: Timestamp) -> t.Dict[str, t.Union[str, int]]:
-        if isinstance(begin, datetime):
-            begin = int(begin.timestamp())
+    def _prepare_states_parameters(timestamp: Timestamp,
+                                   icao24: t.Optional[ICAO24],
+                                   bbox: t.Optional[BoundingBox]) -> t.Dict[str, t.Any]:
+        params = {
+            "time": _to_epoch(timestamp),
+        }
+
+        if icao24 is not None:
+            params["icao24"] = icao24
+
+        if bbox is not None:
+            params["lamin"] = bbox.lamin
+            params["lamax"] = bbox.lamax
+            params["lomin"] = bbox.lomin
+            params["lomax"] = bbox.lomax
+
+        return params
+
+    def _get_flight_connections(self,
+                                url: str,
+                                airport: str,
+                                begin: int,
+                                end: int,
+                                json: bool) -> t.Optional[t.List[t.Union[FlightConnection, t.Dict[str, t.Any]]]]:
+        kwargs = {
+            'extra_params': self._prepare_flight_connection_parameters(airport, begin, end),
+            'many': True
+        }
+
+        if not json:
+            kwargs.update({'response_class': FlightConnection})
 
-        if isinstance(end, datetime):
-            end = int(end.timestamp())
+        return self.perform_request('GET', url, **kwargs)
 
+    @staticmethod
+    def _prepare_flight_connection_parameters(airport: str, begin: int, end: int) -> t.Dict[str, t.Union[str, int]]:
         return {
             "airport": airport,
             "begin": begin,
             "end": end
         }
+
+
+class OpenskyNetworkClient(_BaseOpenskyNetworkClient):
+    def __init__(self, request_handler: RequestHandler) -> None:
+        """
+        :param request_handler: an instance of an object capable of handling http requests, i.e. requests.session()
+        """
+        super().__init__(request_handler)
+
+        # decoded json responses of get_flight_arrivals and get_flight_departures keyed by (url, airport, begin, end)
+        self._flight_connections_cache = OrderedDict()
+
+    def clear_cache(self) -> None:
+        """
+        Discards the memoized responses of get_flight_arrivals and get_flight_departures. Repeated calls with the same
+        airport and a time window in the past are answered from memory until then.
+        """
+        self._flight_connections_cache.clear()
+
+    def iter_state_vectors(self,
+                           timestamp: Timestamp = 0,
+                           icao24: t.Optional[ICAO24] = None,
+                           bbox: t.Optional[BoundingBox] = None) -> t.Iterator[StateVector]:
+        """
+        Alternative to `get_states` for large queries, i.e. the state vectors of the whole globe: the response body is
+        parsed incrementally with ijson while it is being downloaded and the state vectors are yielded one by one, so
+        that neither the whole body nor all the state vectors need to be held in memory. Requires ijson and a request
+        handler that supports `stream=True`, i.e. requests.session().
+
+        :param timestamp: the time in seconds since Unix epoch or datetime, preferably timezone aware in UTC. Current
+                          time will be used if omitted.
+        :param icao24: one or more ICAO24 transponder addresses represented by a hex string (e.g. abc9f3). If omitted,
+                       the state vectors of all aircraft are returned.
+        :param bbox: a bounding box of WGS84 coordinates to query a certain area
+        """
+        if ijson is None:
+            raise ImportError("ijson is required for streaming the state vectors")
+
+        response = self._request_handler.get(self._url_states,
+                                             params=self._prepare_states_parameters(timestamp, icao24, bbox),
+                                             stream=True)
+
+        if response.status_code not in _SUCCESS_STATUS_CODES:
+            try:
+                error = APIError.from_response(response)
+            finally:
+                response.close()
+            raise error
+
+        return self._iter_state_vectors(response)
+
+    @staticmethod
+    def _iter_state_vectors(response) -> t.Iterator[StateVector]:
+        # the raw stream is read as sent, i.e. it has to be decompressed here
+        response.raw.decode_content = True
+
+        try:
+            for state_vector_list in ijson.items(response.raw, 'states.item', use_float=True):
+                yield StateVector.from_json(state_vector_list)
+        finally:
+            response.close()
+
+    def _get_flight_connections(self,
+                                url: str,
+                                airport: str,
+                                begin: int,
+                                end: int,
+                                json: bool) -> t.Optional[t.List[t.Union[FlightConnection, t.Dict[str, t.Any]]]]:
+        # flights are still being added to a time window that reaches the present, so only past ones are memoized
+        if end >= time.time():
+            return super()._get_flight_connections(url, airport, begin, end, json)
+
+        key = (url, airport, begin, end)
+
+        try:
+            flight_connection_dicts = self._flight_connections_cache[key]
+            self._flight_connections_cache.move_to_end(key)
+        except KeyError:
+            flight_connection_dicts = super()._get_flight_connections(url, airport, begin, end, json=True)
+            if flight_connection_dicts is not None:
+                flight_connection_dicts = tuple(flight_connection_dicts)
+            self._flight_connections_cache[key] = flight_connection_dicts
+
+            if len(self._flight_connections_cache) > _FLIGHT_CONNECTIONS_CACHE_SIZE:
+                self._flight_connections_cache.popitem(last=False)
+
+        # an empty body is returned as None, like by the uncached requests
+        if flight_connection_dicts is None:
+            return None
+
+        # fresh dicts and objects on each call, so that the callers cannot alter the memoized response
+        if json:
+            return [dict(flight_connection_dict) for flight_connection_dict in flight_connection_dicts]
+
+        return list(map(FlightConnection.from_json, flight_connection_dicts))
+
+
+class _AsyncBytesReader:
+    """
+    Adapts an asynchronous iterator of bytes, i.e. httpx.Response.aiter_bytes(), to the `read` coroutine that ijson
+    expects from an asynchronous file-like object.
+    """
+    __slots__ = ('_chunks', '_buffer')
+
+    def __init__(self, chunks: t.AsyncIterable[bytes]) -> None:
+        self._chunks = chunks.__aiter__()
+        self._buffer = b''
+
+    async def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            chunks = [self._buffer]
+            async for chunk in self._chunks:
+                chunks.append(chunk)
+            self._buffer = b''
+            return b''.join(chunks)
+
+        # size 0 is used by ijson to check whether the stream yields bytes or str
+        while size and not self._buffer:
+            try:
+                self._buffer = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                return b''
+
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        return data
+
+
+class AsyncOpenskyNetworkClient(_BaseOpenskyNetworkClient):
+    def __init__(self, request_handler: t.Any) -> None:
+        """
+        Variant of OpenskyNetworkClient on top of an asynchronous request handler, so that several queries, i.e. for
+        a number of bounding boxes or airports, can be in flight at the same time with asyncio.gather. All the get_*
+        methods are the same as in OpenskyNetworkClient but return awaitables. An awaitable can be awaited only once,
+        so the flight arrivals and departures are not memoized.
+
+        :param request_handler: an instance of an object capable of handling asynchronous http requests, i.e.
+                                httpx.AsyncClient(base_url='https://opensky-network.org/', http2=True) which
+                                multiplexes the concurrent requests over a single connection.
+        """
+        super().__init__(request_handler)
+
+    @classmethod
+    def create(cls,
+               host: str,
+               https: t.Optional[bool] = True,
+               timeout: t.Optional[float] = None,
+               verify: t.Optional[t.Union[bool, str]] = True,
+               username: t.Optional[str] = None,
+               password: t.Optional[str] = None,
+               http2: t.Optional[bool] = True) -> 'AsyncOpenskyNetworkClient':
+        """
+        Overrides ClientFactory.create, which sets up a synchronous request handler, in order to build the client on
+        top of an httpx.AsyncClient. Requires httpx, and h2 for http2 (see the `async` extra).
+
+        :param host: the host of the OpenSky Network API, i.e. opensky-network.org
+        :param https: whether the requests are sent over https
+        :param timeout: in seconds. The httpx default is used if omitted.
+        :param verify: whether to verify the certificate of the host, or the path of the CA bundle to verify it with
+        :param username: the OpenSky Network user, if any
+        :param password: the password of the user
+        :param http2: whether to multiplex the concurrent requests over a single http2 connection
+        """
+        try:
+            import httpx
+        except ImportError:  # httpx is an optional dependency, imported on demand as it is slow to import
+            raise ImportError("httpx is required in order to create an AsyncOpenskyNetworkClient") from None
+
+        kwargs = {
+            'base_url': f"{'https' if https else 'http'}://{host}/",
+            'verify': verify,
+            'http2': http2,
+        }
+
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+
+        if username is not None:
+            kwargs['auth'] = (username, password)
+
+        return cls(request_handler=httpx.AsyncClient(**kwargs))
+
+    async def iter_state_vectors(self,
+                                 timestamp: Timestamp = 0,
+                                 icao24: t.Optional[ICAO24] = None,
+                                 bbox: t.Optional[BoundingBox] = None) -> t.AsyncIterator[StateVector]:
+        """
+        Same as OpenskyNetworkClient.iter_state_vectors but streams the response with the `stream` method of the
+        request handler, i.e. httpx.AsyncClient, and is iterated with `async for`.
+        """
+        if ijson is None:
+            raise ImportError("ijson is required for streaming the state vectors")
+
+        async with self._request_handler.stream('GET', self._url_states,
+                                                params=self._prepare_states_parameters(timestamp, icao24, bbox)) \
+                as response:
+            if response.status_code not in _SUCCESS_STATUS_CODES:
+                await response.aread()
+                raise APIError.from_response(response)
+
+            # aiter_bytes yields the body already decompressed
+            state_vector_lists = ijson.items_async(_AsyncBytesReader(response.aiter_bytes()), 'states.item',
+                                                   use_float=True)
+            async for state_vector_list in state_vector_lists:
+                yield StateVector.from_json(state_vector_list)
+
+    async def perform_request(self,
+                              method: str,
+                              url: str,
+                              extra_params: t.Optional[t.Dict[str, t.Any]] = None,
+                              json: t.Optional[t.Dict[str, t.Any]] = None,
+                              response_class: t.Optional[type] = None,
+                              many: t.Optional[bool] = False) -> t.Any:
+        """
+        Same as OpenskyNetworkClient.perform_request but awaits the response of the request handler.
+        """
+        response = await self._send_request(method, url, extra_params, json)
+
+        return self._process_response(response, response_class, many)
+
+    def _get(self, url: str, extra_params: t.Optional[t.Dict[str, t.Any]], json: t.Optional[t.Dict[str, t.Any]]):
+        # asynchronous clients such as httpx do not accept a body on GET requests
+        return self._request_handler.get(url,
+                                         params=extra_params if extra_params is not None else _EMPTY_PARAMS)
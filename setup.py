@@ -39,7 +39,16 @@ setup(
     author_email='',
     packages=find_packages(exclude=['tests']),
     url='https://github.com/eurocontrol-swim/opensky-network-client',
-    install_requires=[],
+    install_requires=[
+        'orjson'
+    ],
+    extras_require={
+        'simdjson': ['pysimdjson'],
+        'numpy': ['numpy'],
+        'numba': ['numpy', 'numba'],
+        'async': ['httpx[http2]'],
+        'streaming': ['ijson']
+    },
     tests_require=[
         'pytest',
         'pytest-cov'
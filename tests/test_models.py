@@ -27,8 +27,16 @@ http://opensource.org/licenses/BSD-3-Clause
 
 Details on EUROCONTROL: http://www.eurocontrol.int
 """
+import copy
+import pickle
+import subprocess
+import sys
+from dataclasses import FrozenInstanceError
+from datetime import datetime
+
 import pytest
 
+from opensky_network_client import models
 from opensky_network_client.models import StateVector, States, PositionSource, FlightConnection, BoundingBox, Airport, \
     Position
 
@@ -49,6 +57,114 @@ def test_state_vector__from_json(state_vector_list, expected_state_vector):
     assert expected_state_vector.icao24 == "3c6444"
 
 
+def test_state_vector__from_json__extra_trailing_values__are_kept_apart():
+    state_vector = StateVector.from_json(["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964,
+                                          9639.3, False, 232.88, 98.26, 4.55, None, 9547.86, "1000", False, 0, 3])
+
+    assert PositionSource.ASD_B is state_vector.position_source
+    assert (3,) == state_vector._rest_args
+
+
+@pytest.mark.parametrize('position_source, expected_position_source', [
+    (0, PositionSource.ASD_B),
+    (1, PositionSource.ASTERIX),
+    (2, PositionSource.MLAT),
+    (3, PositionSource.FLARM),
+    (PositionSource.MLAT, PositionSource.MLAT),
+])
+def test_state_vector__from_json__position_source_is_converted(position_source, expected_position_source):
+    state_vector = StateVector.from_json(["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964,
+                                          9639.3, False, 232.88, 98.26, 4.55, None, 9547.86, "1000", False,
+                                          position_source])
+
+    assert expected_position_source is state_vector.position_source
+
+
+@pytest.mark.parametrize('position_source', [4, -1])
+def test_state_vector__from_json__unknown_position_source__is_kept_as_is(position_source):
+    state_vector = StateVector.from_json(["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964,
+                                          9639.3, False, 232.88, 98.26, 4.55, None, 9547.86, "1000", False,
+                                          position_source])
+
+    assert position_source == state_vector.position_source
+
+
+def test_state_vector__from_json__position_source_is_null__stays_none():
+    state_vector = StateVector.from_json(["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964,
+                                          9639.3, False, 232.88, 98.26, 4.55, None, 9547.86, "1000", False, None])
+
+    assert state_vector.position_source is None
+
+
+def test_state_vector__repeated_strings__are_shared_between_instances():
+    state_vectors = [
+        StateVector.from_json([''.join(["3c6", "444"]), ''.join(["DLH", "9LF "]), ''.join(["Ger", "many"]), 1458564120,
+                               1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26, 4.55, None, 9547.86,
+                               ''.join(["10", "00"]), False, PositionSource.ASD_B])
+        for _ in range(2)
+    ]
+
+    assert state_vectors[0].icao24 is state_vectors[1].icao24
+    assert state_vectors[0].callsign is state_vectors[1].callsign
+    assert state_vectors[0].origin_country is state_vectors[1].origin_country
+    assert state_vectors[0].squawk is state_vectors[1].squawk
+
+
+def test_state_vector__different_attribute_values__are_not_equal():
+    state_vector_list = ["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88,
+                         98.26, 4.55, None, 9547.86, "1000", False, PositionSource.ASD_B]
+
+    state_vector = StateVector.from_json(state_vector_list)
+    other_state_vector = StateVector.from_json(state_vector_list)
+    other_state_vector.callsign = "DLH9LG "
+
+    assert state_vector != other_state_vector
+
+
+@pytest.mark.parametrize('model', [
+    StateVector("3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
+                4.55, None, 9547.86, "1000", False, 0),
+    States(time_in_sec=1458564121, states=[]),
+    FlightConnection("0101be", 1517220729, None, 1517230737, "EDDF", "MSR785 ", None, None, 1593, 95, 0, 2),
+    BoundingBox(lamin=45.0, lamax=55.0, lomin=0.0, lomax=10.0),
+    Position(37.4146, 55.972599, 189.5856, True),
+])
+def test_models__have_no_instance_dict(model):
+    assert not hasattr(model, '__dict__')
+
+
+def _make_state_vector_list(icao24):
+    return [icao24, "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26, 4.55,
+            None, 9547.86, "1000", False, 0]
+
+
+def test_state_vector_subclass__without_own_slots__compares_the_inherited_slots():
+    class StateVectorSubclass(StateVector):
+        __slots__ = ()
+
+    assert StateVectorSubclass.from_json(_make_state_vector_list("3c6444")) == \
+        StateVectorSubclass.from_json(_make_state_vector_list("3c6444"))
+    assert StateVectorSubclass.from_json(_make_state_vector_list("3c6444")) != \
+        StateVectorSubclass.from_json(_make_state_vector_list("4b1806"))
+
+
+def test_state_vector_subclass__with_own_slot__compares_the_inherited_and_own_slots():
+    class StateVectorSubclass(StateVector):
+        __slots__ = ('category',)
+
+    state_vector = StateVectorSubclass.from_json(_make_state_vector_list("3c6444"))
+    other_state_vector = StateVectorSubclass.from_json(_make_state_vector_list("4b1806"))
+    state_vector.category = other_state_vector.category = 3
+
+    assert state_vector != other_state_vector
+
+    other_state_vector.icao24 = "3c6444"
+    assert state_vector == other_state_vector
+
+    other_state_vector.category = 4
+    assert state_vector != other_state_vector
+
+
 @pytest.mark.parametrize('states_dict, expected_states', [
     (
         {
@@ -78,6 +194,184 @@ def test_states__from_json(states_dict, expected_states):
     assert expected_states.states[1].icao24 == "4b1806"
 
 
+def test_states__array_from_json():
+    np = pytest.importorskip('numpy')
+
+    states_dict = {
+        "time": 1458564121,
+        "states": [
+            ["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 0],
+            ["4b1806", None, "Greece", None, 1458564120, None, None, None, True, None, None, None, None, None, None,
+             False, 2],
+            ["4b1807", None, "Greece", None, 1458564120, None, None, None, True, None, None, None, None, None, None,
+             False, None]
+        ]
+    }
+
+    states_array = States.array_from_json(states_dict)
+
+    assert 3 == len(states_array)
+    assert ["3c6444", "4b1806", "4b1807"] == states_array['icao24'].tolist()
+    assert ["DLH9LF ", "", ""] == states_array['callsign'].tolist()
+    assert 6.1546 == states_array['longitude'][0]
+    assert np.isnan(states_array['longitude'][1])
+    assert [False, True, True] == states_array['on_ground'].tolist()
+    assert [0, 2, -1] == states_array['position_source'].tolist()
+
+
+def test_states__as_arrays():
+    pytest.importorskip('numpy')
+
+    states = States.from_json({
+        "time": 1458564121,
+        "states": [
+            ["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, PositionSource.ASD_B],
+            ["4b1806", "DLH9LF ", "Greece", 1458564120, 1458564120, 7.1546, 51.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, PositionSource.MLAT]
+        ]
+    })
+
+    arrays = states.as_arrays()
+
+    assert [None, None] == states.states._state_vectors
+    assert all(array.flags['C_CONTIGUOUS'] for array in arrays.values())
+    assert 'sensors' not in arrays
+    assert ["3c6444", "4b1806"] == arrays['icao24'].tolist()
+    assert [6.1546, 7.1546] == arrays['longitude'].tolist()
+    assert [50.1964, 51.1964] == arrays['latitude'].tolist()
+    assert [0, 2] == arrays['position_source'].tolist()
+
+
+def test_states__time__is_computed_on_access_and_does_not_affect_equality():
+    states = States(time_in_sec=1458564121, states=[])
+    other_states = States(time_in_sec=1458564121, states=[])
+
+    assert datetime.fromtimestamp(1458564121) == states.time
+    assert states.time is states.time
+    assert other_states == states
+
+
+def test_states__time_in_sec_is_changed__time_is_recomputed():
+    states = States(time_in_sec=1458564121, states=[])
+    assert datetime.fromtimestamp(1458564121) == states.time
+
+    states.time_in_sec = 1458564181
+
+    assert datetime.fromtimestamp(1458564181) == states.time
+
+
+def test_states__from_json__state_vectors_are_created_on_access():
+    states = States.from_json({
+        "time": 1458564121,
+        "states": [
+            ["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 0],
+            ["4b1806", "DLH9LF ", "Greece", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 0]
+        ]
+    })
+
+    assert 2 == len(states.states)
+    assert [None, None] == states.states._state_vectors
+
+    state_vector = states.states[1]
+
+    assert "4b1806" == state_vector.icao24
+    assert states.states._state_vector_lists[1] is None
+    assert state_vector is states.states[-1]
+    assert [state_vector] == states.states[1:]
+    assert states.states._state_vectors[0] is None
+    assert ["3c6444", "4b1806"] == [state_vector.icao24 for state_vector in states.states]
+
+
+def test_states__from_json__states_is_null__empty_list_of_states():
+    states = States.from_json({"time": 1458564121, "states": None})
+
+    assert [] == states.states
+
+
+def test_states__as_arrays__state_vectors_were_modified__modified_values_are_returned():
+    pytest.importorskip('numpy')
+
+    states = States.from_json({
+        "time": 1458564121,
+        "states": [
+            ["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 0]
+        ]
+    })
+    states.states[0].latitude = 51.1964
+
+    arrays = states.as_arrays()
+
+    assert [51.1964] == arrays['latitude'].tolist()
+
+
+@pytest.mark.parametrize('materialize', [False, True])
+def test_states__filter_bbox(materialize):
+    pytest.importorskip('numpy')
+
+    states = States.from_json({
+        "time": 1458564121,
+        "states": [
+            ["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 0],
+            ["4b1806", "DLH9LF ", "Greece", 1458564120, 1458564120, 23.1546, 38.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 2],
+            ["4b1807", "DLH9LF ", "Greece", 1458564120, 1458564120, None, None, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 2]
+        ]
+    })
+    if materialize:
+        list(states.states)
+
+    filtered = states.filter_bbox(BoundingBox(lamin=45.0, lamax=55.0, lomin=0.0, lomax=10.0))
+
+    assert 1458564121 == filtered.time_in_sec
+    assert ["3c6444"] == [state_vector.icao24 for state_vector in filtered.states]
+
+
+def test_states__filter_bbox__states_is_a_list_of_state_vectors():
+    pytest.importorskip('numpy')
+
+    states = States(time_in_sec=1458564121, states=[
+        StateVector("3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88,
+                    98.26, 4.55, None, 9547.86, "1000", False, 0),
+        StateVector("4b1806", "DLH9LF ", "Greece", 1458564120, 1458564120, 23.1546, 38.1964, 9639.3, False, 232.88,
+                    98.26, 4.55, None, 9547.86, "1000", False, 2)
+    ])
+
+    filtered = states.filter_bbox(BoundingBox(lamin=45.0, lamax=55.0, lomin=0.0, lomax=10.0))
+
+    assert [states.states[0]] == filtered.states
+
+
+@pytest.mark.parametrize('materialize', [False, True])
+def test_states__filter_bbox__filtered_states_are_filtered_again(materialize):
+    pytest.importorskip('numpy')
+
+    states = States.from_json({
+        "time": 1458564121,
+        "states": [
+            ["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 0],
+            ["4b1806", "DLH9LF ", "Greece", 1458564120, 1458564120, 8.1546, 52.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 2],
+            ["4b1807", "DLH9LF ", "Greece", 1458564120, 1458564120, 23.1546, 38.1964, 9639.3, False, 232.88, 98.26,
+             4.55, None, 9547.86, "1000", False, 2]
+        ]
+    })
+    if materialize:
+        list(states.states)
+
+    filtered = states.filter_bbox(BoundingBox(lamin=45.0, lamax=55.0, lomin=0.0, lomax=10.0))
+    filtered_again = filtered.filter_bbox(BoundingBox(lamin=45.0, lamax=51.0, lomin=0.0, lomax=7.0))
+
+    assert ["3c6444"] == [state_vector.icao24 for state_vector in filtered_again.states]
+
+
 @pytest.mark.parametrize('flight_connection_dict, expected_flight_connection', [
     (
         {
@@ -116,25 +410,62 @@ def test_flight_connection__from_json(flight_connection_dict, expected_flight_co
     assert expected_flight_connection == flight_connection
 
 
+def test_flight_connection__different_attribute_values__are_not_equal():
+    flight_connection = FlightConnection("0101be", 1517220729, None, 1517230737, "EDDF", "MSR785 ", None, None, 1593,
+                                         95, 0, 2)
+    other_flight_connection = FlightConnection("0101be", 1517220729, None, 1517230737, "EDDF", "MSR785 ", None, None,
+                                               1593, 95, 0, 3)
+
+    assert flight_connection != other_flight_connection
+    assert not flight_connection != FlightConnection("0101be", 1517220729, None, 1517230737, "EDDF", "MSR785 ", None,
+                                                     None, 1593, 95, 0, 2)
+
+
 @pytest.mark.parametrize('lamin, lamax, lomin, lomax', [
     (-100, 80, 50, 50),
     (80, -100, 50, 50),
     (85, 80, -190, 50),
     (85, 80, 50, -190),
+    (85, 80, 45, 50),
+    (80, 85, 50, 45),
 ])
 def test_bounding_box__incorrect_lat_lon_values__raises_value_error(lamin, lamax, lomin, lomax):
     with pytest.raises(ValueError):
         BoundingBox(lamin, lamax, lomin, lomax)
 
 
+def test_bounding_box__is_immutable():
+    bounding_box = BoundingBox(lamin=45, lamax=55, lomin=0, lomax=10)
+
+    with pytest.raises(FrozenInstanceError):
+        bounding_box.lamin = 50
+
+
+@pytest.mark.parametrize('copy_bounding_box', [
+    copy.copy,
+    copy.deepcopy,
+    lambda bounding_box: pickle.loads(pickle.dumps(bounding_box)),
+])
+def test_bounding_box__copied_or_pickled__equal_immutable_box_is_restored(copy_bounding_box):
+    bounding_box = BoundingBox(lamin=45, lamax=55, lomin=0, lomax=10)
+    bounding_box.to_json()
+
+    bounding_box_copy = copy_bounding_box(bounding_box)
+
+    assert bounding_box == bounding_box_copy
+    assert bounding_box.to_json() == bounding_box_copy.to_json()
+    with pytest.raises(FrozenInstanceError):
+        bounding_box_copy.lamin = 50
+
+
 @pytest.mark.parametrize('bounding_box, expected_dict', [
     (
-        BoundingBox(lamin=85.453421, lamax=80.545676, lomin=50.454257, lomax=45.871253),
+        BoundingBox(lamin=80.545676, lamax=85.453421, lomin=45.871253, lomax=50.454257),
         {
-            "lamin": 85.453421,
-            "lamax": 80.545676,
-            "lomin": 50.454257,
-            "lomax": 45.871253
+            "lamin": 80.545676,
+            "lamax": 85.453421,
+            "lomin": 45.871253,
+            "lomax": 50.454257
         }
     )
 ])
@@ -142,6 +473,32 @@ def test_bounding_box__serialize(bounding_box, expected_dict):
     bounding_box_dict = bounding_box.to_json()
 
     assert expected_dict == bounding_box_dict
+    assert bounding_box_dict is bounding_box.to_json()
+
+
+@pytest.mark.parametrize('use_numba', [True, False])
+def test_bounding_box__contains_mask(use_numba, monkeypatch):
+    np = pytest.importorskip('numpy')
+    if use_numba:
+        pytest.importorskip('numba')
+    else:
+        monkeypatch.setattr(models, '_bounding_box_mask_kernel', lambda: None)
+
+    bounding_box = BoundingBox(lamin=45, lamax=55, lomin=0, lomax=10)
+    latitudes = np.array([50.1964, 50.1964, 40.5, np.nan, 55])
+    longitudes = np.array([6.1546, 16.1546, 6.1546, 6.1546, 0])
+
+    mask = bounding_box.contains_mask(latitudes, longitudes)
+
+    assert [True, False, False, False, True] == mask.tolist()
+
+
+def test_models__imported__numpy_and_numba_are_not_imported():
+    code = "import sys, opensky_network_client.models; print('numpy' in sys.modules, 'numba' in sys.modules)"
+
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+
+    assert "False False" == result.stdout.strip()
 
 
 @pytest.mark.parametrize('airport_dict, expected_airport', [
@@ -193,4 +550,14 @@ def test_bounding_box__serialize(bounding_box, expected_dict):
 def test_airport__from_json(airport_dict, expected_airport):
     airport = Airport.from_json(airport_dict)
 
-    assert expected_airport == airport
\ No newline at end of file
+    assert expected_airport == airport
+
+
+def test_airport__different_position__are_not_equal():
+    airport = Airport('UUEE', 'SVO', 'Sheremetyevo International Airport', None, None,
+                      Position(37.4146, 55.972599, 189.5856, True), 'EU', 'RU', 'RU-MOS', 'Moscow', 'UUEE', None, None)
+    other_airport = Airport('UUEE', 'SVO', 'Sheremetyevo International Airport', None, None,
+                            Position(37.4146, 55.972599, 189.5856, False), 'EU', 'RU', 'RU-MOS', 'Moscow', 'UUEE', None,
+                            None)
+
+    assert airport != other_airport
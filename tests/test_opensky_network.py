@@ -27,386 +27,463 @@ http://opensource.org/licenses/BSD-3-Clause
 
 Details on EUROCONTROL: http://www.eurocontrol.int
 """
-from datetime import datetime
-from unittest.mock import Mock
-
+import asyncio
+import contextlib
+import io
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import Mock, AsyncMock
+
+import orjson
 import pytest
 
 from rest_client.errors import APIError
-from opensky_network_client.models import BoundingBox
-from opensky_network_client.opensky_network import OpenskyNetworkClient
-from tests.utils import make_states, make_flight_connection_list, make_airport
+from opensky_network_client.models import BoundingBox, FlightConnection
+from opensky_network_client import opensky_network
+from opensky_network_client.opensky_network import OpenskyNetworkClient, AsyncOpenskyNetworkClient
+from tests.utils import make_states, make_flight_connection_list, make_airport, Recorder, \
+    assert_params_subset
 
 __author__ = "EUROCONTROL (SWIM)"
 
 
-@pytest.mark.parametrize('error_code', [400, 401, 403, 404, 500])
-def test_get_states__http_error_code__raises_api_error(error_code):
-    response = Mock()
-    response.status_code = error_code
+@pytest.fixture(scope='session')
+def states_payload():
+    return make_states()
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
+@pytest.fixture(scope='session')
+def flight_connections_payload():
+    return make_flight_connection_list()
 
-    with pytest.raises(APIError):
-        client.get_states()
 
+@pytest.fixture(scope='session')
+def airport_payload():
+    return make_airport()
 
-def test_get_states__states_object_is_returned():
-    states_dict, expected_states = make_states()
 
-    response = Mock()
-    response.status_code = 200
-    response.content = states_dict
-    response.json = Mock(return_value=states_dict)
+@pytest.fixture
+def mock_response():
+    def make_response(payload, status_code=200):
+        # the client parses the raw content itself, response.json() is never called
+        return SimpleNamespace(status_code=status_code, content=b'' if payload is None else orjson.dumps(payload))
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    return make_response
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
 
-    params = {
-        'timestamp': 1517230800,
-        'icao24': '3c4ad0',
-        'bbox': BoundingBox(lamin=85.453421, lamax=80.545676, lomin=50.454257, lomax=45.871253)
-    }
-    states = client.get_states(**params)
+@pytest.fixture
+def request_handler():
+    # the response is set by each test as the return_value of get
+    return SimpleNamespace(get=Recorder())
 
-    assert expected_states == states
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['time'] == params['timestamp']
-    assert call_args['params']['icao24'] == params['icao24']
-    assert call_args['params']['lamin'] == params['bbox'].lamin
-    assert call_args['params']['lamax'] == params['bbox'].lamax
-    assert call_args['params']['lomin'] == params['bbox'].lomin
-    assert call_args['params']['lomax'] == params['bbox'].lomax
+@pytest.fixture(scope='session')
+def session_client():
+    return OpenskyNetworkClient(request_handler=SimpleNamespace(get=Recorder()))
 
 
-def test_get_states__json_true__states_dict_is_returned():
-    states_dict, _ = make_states()
+@pytest.fixture
+def client(session_client, request_handler, monkeypatch):
+    # the client is built once and only its request handler is replaced per test
+    monkeypatch.setattr(session_client, '_request_handler', request_handler)
+    session_client.clear_cache()
 
-    response = Mock()
-    response.status_code = 200
-    response.content = states_dict
-    response.json = Mock(return_value=states_dict)
+    return session_client
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
+@pytest.fixture
+def client_with_error(client, request_handler):
+    def make_client(error_code):
+        response = Mock()
+        response.status_code = error_code
+        request_handler.get.return_value = response
 
-    params = {
-        'timestamp': 1517230800,
-        'icao24': '3c4ad0',
-        'bbox': BoundingBox(lamin=85.453421, lamax=80.545676, lomin=50.454257, lomax=45.871253),
-        'json': True
-    }
-    states = client.get_states(**params)
+        return client
 
-    assert states_dict == states
+    return make_client
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['time'] == params['timestamp']
-    assert call_args['params']['icao24'] == params['icao24']
-    assert call_args['params']['lamin'] == params['bbox'].lamin
-    assert call_args['params']['lamax'] == params['bbox'].lamax
-    assert call_args['params']['lomin'] == params['bbox'].lomin
-    assert call_args['params']['lomax'] == params['bbox'].lomax
 
+# a fixed naive datetime, i.e. in local time, rather than datetime.now() for reproducible test cases
+_TIMESTAMP = datetime(2018, 1, 29, 13)
+_TIMESTAMP_IN_SEC = int(_TIMESTAMP.timestamp())
 
-def test_get_states__time_is_timestamp__it_is_converted_to_int_and_states_object_is_returned():
-    states_dict, expected_states = make_states()
+_BBOX = BoundingBox(lamin=80.545676, lamax=85.453421, lomin=45.871253, lomax=50.454257)
 
-    response = Mock()
-    response.status_code = 200
-    response.content = states_dict
-    response.json = Mock(return_value=states_dict)
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+@pytest.mark.parametrize('error_code', [400, 401, 403, 404, 500])
+@pytest.mark.parametrize('method_name, kwargs', [
+    ('get_states', {}),
+    pytest.param('iter_state_vectors', {},
+                 marks=pytest.mark.skipif(opensky_network.ijson is None, reason="ijson is not installed")),
+    ('get_flight_arrivals', {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800}),
+    ('get_flight_departures', {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800}),
+    ('get_airport', {'icao': 'EDDF'}),
+])
+def test_get__http_error_code__raises_api_error(method_name, kwargs, error_code, client_with_error):
+    with pytest.raises(APIError):
+        getattr(client_with_error(error_code), method_name)(**kwargs)
+
+
+@pytest.mark.parametrize('method_name, payload_fixture, kwargs, json, expected_params', [
+    (
+        'get_states', 'states_payload',
+        {'timestamp': 1517230800, 'icao24': '3c4ad0', 'bbox': _BBOX},
+        False,
+        {'time': 1517230800, 'icao24': '3c4ad0', **_BBOX.to_json()}
+    ),
+    (
+        'get_states', 'states_payload',
+        {'timestamp': 1517230800, 'icao24': '3c4ad0', 'bbox': _BBOX},
+        True,
+        {'time': 1517230800, 'icao24': '3c4ad0', **_BBOX.to_json()}
+    ),
+    (
+        'get_states', 'states_payload',
+        {'timestamp': _TIMESTAMP, 'icao24': '3c4ad0', 'bbox': _BBOX},
+        False,
+        {'time': _TIMESTAMP_IN_SEC, 'icao24': '3c4ad0', **_BBOX.to_json()}
+    ),
+    (
+        'get_flight_arrivals', 'flight_connections_payload',
+        {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800},
+        False,
+        {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800}
+    ),
+    (
+        'get_flight_arrivals', 'flight_connections_payload',
+        {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800},
+        True,
+        {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800}
+    ),
+    (
+        'get_flight_arrivals', 'flight_connections_payload',
+        {'airport': 'EDDF', 'begin': _TIMESTAMP, 'end': _TIMESTAMP},
+        False,
+        {'airport': 'EDDF', 'begin': _TIMESTAMP_IN_SEC, 'end': _TIMESTAMP_IN_SEC}
+    ),
+    (
+        'get_flight_departures', 'flight_connections_payload',
+        {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800},
+        False,
+        {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800}
+    ),
+    (
+        'get_flight_departures', 'flight_connections_payload',
+        {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800},
+        True,
+        {'airport': 'EDDF', 'begin': 1517227200, 'end': 1517230800}
+    ),
+    (
+        'get_flight_departures', 'flight_connections_payload',
+        {'airport': 'EDDF', 'begin': _TIMESTAMP, 'end': _TIMESTAMP},
+        False,
+        {'airport': 'EDDF', 'begin': _TIMESTAMP_IN_SEC, 'end': _TIMESTAMP_IN_SEC}
+    ),
+    (
+        'get_airport', 'airport_payload',
+        {'icao': 'EDDF'},
+        False,
+        {'icao': 'EDDF'}
+    ),
+    (
+        'get_airport', 'airport_payload',
+        {'icao': 'EDDF'},
+        True,
+        {'icao': 'EDDF'}
+    ),
+])
+def test_get__object_or_dict_is_returned_and_query_params_are_passed(method_name, payload_fixture, kwargs, json,
+                                                                     expected_params, request, mock_response,
+                                                                     request_handler, client):
+    payload, expected_object = request.getfixturevalue(payload_fixture)
+
+    request_handler.get.return_value = mock_response(payload)
+
+    result = getattr(client, method_name)(json=json, **kwargs)
+
+    assert (payload if json else expected_object) == result
+
+    assert_params_subset(request_handler, expected_params)
+
+
+def test_get_states__simdjson_is_installed__models_hold_plain_python_objects(states_payload, mock_response,
+                                                                             request_handler, client):
+    pytest.importorskip('simdjson')
+    states_dict, expected_states = states_payload
+
+    request_handler.get.return_value = mock_response(states_dict)
+
+    states = client.get_states()
+
+    assert all(type(state_vector_list) is list for state_vector_list in states._state_vector_rows())
+    assert expected_states == states
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
 
-    timestamp = datetime.now()
-    params = {
-        'timestamp': timestamp,
-        'icao24': '3c4ad0',
-        'bbox': BoundingBox(lamin=85.453421, lamax=80.545676, lomin=50.454257, lomax=45.871253)
-    }
-    states = client.get_states(**params)
+def test_get_flight_arrivals__simdjson_is_installed__models_are_given_plain_python_objects(monkeypatch,
+                                                                                           flight_connections_payload,
+                                                                                           mock_response,
+                                                                                           request_handler, client):
+    pytest.importorskip('simdjson')
+    flight_arrivals_dict_list, expected_flight_arrivals_list = flight_connections_payload
 
-    assert expected_states == states
+    from_json = FlightConnection.from_json
+    from_json_args = []
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['time'] == int(params['timestamp'].timestamp())
-    assert call_args['params']['icao24'] == params['icao24']
-    assert call_args['params']['lamin'] == params['bbox'].lamin
-    assert call_args['params']['lamax'] == params['bbox'].lamax
-    assert call_args['params']['lomin'] == params['bbox'].lomin
-    assert call_args['params']['lomax'] == params['bbox'].lomax
+    def recording_from_json(flight_connection_dict):
+        from_json_args.append(flight_connection_dict)
+        return from_json(flight_connection_dict)
 
+    monkeypatch.setattr(FlightConnection, 'from_json', recording_from_json)
+    request_handler.get.return_value = mock_response(flight_arrivals_dict_list)
 
-@pytest.mark.parametrize('error_code', [400, 401, 403, 404, 500])
-def test_get_flight_arrivals__http_error_code__raises_api_error(error_code):
-    response = Mock()
-    response.status_code = error_code
+    # a time window reaching the future is not memoized, so that the response is parsed as FlightConnection
+    flight_arrivals = client.get_flight_arrivals(airport='EDDF', begin=1517227200, end=int(time.time()) + 3600)
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    assert expected_flight_arrivals_list == flight_arrivals
+    assert all(type(flight_connection_dict) is dict for flight_connection_dict in from_json_args)
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
 
-    with pytest.raises(APIError):
-        client.get_flight_arrivals(airport='EDDF', begin=1517227200, end=1517230800)
+def test_get_states__simdjson_is_not_installed__response_is_parsed_with_orjson(monkeypatch, states_payload,
+                                                                               mock_response, request_handler, client):
+    monkeypatch.setattr(opensky_network, 'simdjson', None)
 
+    states_dict, expected_states = states_payload
 
-def test_get_flight_arrivals__flight_arrivals_object_is_returned():
-    flight_arrivals_dict_list, expected_flight_arrivals_list = make_flight_connection_list()
+    request_handler.get.return_value = mock_response(states_dict)
 
-    response = Mock()
-    response.status_code = 200
-    response.content = flight_arrivals_dict_list
-    response.json = Mock(return_value=flight_arrivals_dict_list)
+    states = client.get_states()
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    assert expected_states == states
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
 
-    params = {
-        'airport': 'EDDF',
-        'begin': 1517227200,
-        'end': 1517230800
-    }
-    flight_arrivals = client.get_flight_arrivals(**params)
+def test_iter_state_vectors__state_vectors_are_yielded_from_the_streamed_response(states_payload, request_handler,
+                                                                                  client):
+    pytest.importorskip('ijson')
+    states_dict, expected_states = states_payload
 
-    assert expected_flight_arrivals_list == flight_arrivals
+    response = SimpleNamespace(status_code=200, raw=io.BytesIO(orjson.dumps(states_dict)), close=Recorder())
+    request_handler.get.return_value = response
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['airport'] == params['airport']
-    assert call_args['params']['begin'] == params['begin']
-    assert call_args['params']['end'] == params['end']
+    state_vectors = client.iter_state_vectors(timestamp=1458564121)
 
+    assert list(expected_states.states) == list(state_vectors)
+    assert request_handler.get.calls[-1][1]['stream'] is True
+    assert_params_subset(request_handler, {'time': 1458564121})
+    assert 1 == len(response.close.calls)
 
-def test_get_flight_arrivals__json_true__flight_arrivals_dict_is_returned():
-    flight_arrivals_dict_list, _ = make_flight_connection_list()
 
-    response = Mock()
-    response.status_code = 200
-    response.content = flight_arrivals_dict_list
-    response.json = Mock(return_value=flight_arrivals_dict_list)
+@pytest.mark.parametrize('json', [True, False])
+def test_perform_request__empty_response_content__returns_none(json, mock_response, request_handler, client):
+    request_handler.get.return_value = mock_response(None, status_code=204)
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    assert client.get_airport(icao='EDDF', json=json) is None
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
 
-    params = {
-        'airport': 'EDDF',
-        'begin': 1517227200,
-        'end': 1517230800,
-        'json': True
-    }
-    flight_arrivals = client.get_flight_arrivals(**params)
+@pytest.mark.parametrize('json', [True, False])
+def test_get_flight_arrivals__no_flights__empty_list_is_returned(json, mock_response, request_handler, client):
+    request_handler.get.return_value = mock_response([])
 
-    assert flight_arrivals_dict_list == flight_arrivals
+    assert [] == client.get_flight_arrivals(airport='EDDF', begin=1517227200, end=1517230800, json=json)
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['airport'] == params['airport']
-    assert call_args['params']['begin'] == params['begin']
-    assert call_args['params']['end'] == params['end']
 
+def test_perform_request__unsupported_method__raises_not_implemented_error(client):
+    with pytest.raises(NotImplementedError):
+        client.perform_request('PATCH', 'api/airports/')
 
-def test_get_flight_arrivals__with_begin_end_datetime__is_converted_to_int_and_flight_arrivals_object_is_returned():
-    flight_arrivals_dict_list, expected_flight_arrivals_list = make_flight_connection_list()
 
-    response = Mock()
-    response.status_code = 200
-    response.content = flight_arrivals_dict_list
-    response.json = Mock(return_value=flight_arrivals_dict_list)
+def test_perform_request__get_without_extra_params__empty_params_and_default_headers_are_passed(
+        mock_response, request_handler, client):
+    request_handler.get.return_value = mock_response(None)
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    client.perform_request('GET', 'api/states/all/')
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
+    call_args = request_handler.get.calls[-1][1]
+    assert {} == call_args['params']
+    # the compression is negotiated by the request handler, i.e. requests or httpx, with its own defaults
+    assert 'headers' not in call_args
 
-    timestamp = datetime.now()
-    params = {
-        'airport': 'EDDF',
-        'begin': timestamp,
-        'end': timestamp
-    }
-    flight_arrivals = client.get_flight_arrivals(**params)
 
-    assert expected_flight_arrivals_list == flight_arrivals
+def test_async_client__concurrent_requests__objects_are_returned(states_payload, airport_payload, mock_response):
+    states_dict, expected_states = states_payload
+    airport_dict, expected_airport = airport_payload
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['airport'] == params['airport']
-    assert call_args['params']['begin'] == int(params['begin'].timestamp())
-    assert call_args['params']['end'] == int(params['end'].timestamp())
+    # AsyncMock is kept here since the handler has to return awaitables
+    request_handler = SimpleNamespace(get=AsyncMock(side_effect=[mock_response(states_dict),
+                                                                 mock_response(airport_dict)]))
+
+    client = AsyncOpenskyNetworkClient(request_handler=request_handler)
+
+    async def gather():
+        return await asyncio.gather(client.get_states(), client.get_airport(icao='EDDF'))
+
+    states, airport = asyncio.run(gather())
+
+    assert expected_states == states
+    assert expected_airport == airport
+    assert 'json' not in request_handler.get.call_args[1]
 
 
 @pytest.mark.parametrize('error_code', [400, 401, 403, 404, 500])
-def test_get_flight_departures__http_error_code__raises_api_error(error_code):
+def test_async_client__http_error_code__raises_api_error(error_code):
     response = Mock()
     response.status_code = error_code
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    request_handler = SimpleNamespace(get=AsyncMock(return_value=response))
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
+    client = AsyncOpenskyNetworkClient(request_handler=request_handler)
 
     with pytest.raises(APIError):
-        client.get_flight_departures(airport='EDDF', begin=1517227200, end=1517230800)
+        asyncio.run(client.get_states())
 
 
-def test_get_flight_departures__flight_departures_object_is_returned():
-    flight_departures_dict_list, expected_flight_departures_list = make_flight_connection_list()
+def _make_async_stream_request_handler(status_code, content):
+    """
+    Stands for httpx.AsyncClient.stream, yielding the content in small chunks like a response arriving over the wire.
+    """
+    calls = []
 
-    response = Mock()
-    response.status_code = 200
-    response.content = flight_departures_dict_list
-    response.json = Mock(return_value=flight_departures_dict_list)
+    async def aiter_bytes():
+        for i in range(0, len(content), 64):
+            yield content[i:i + 64]
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    async def aread():
+        return content
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
+    @contextlib.asynccontextmanager
+    async def stream(method, url, **kwargs):
+        calls.append((method, url, kwargs))
+        yield SimpleNamespace(status_code=status_code, content=content, aiter_bytes=aiter_bytes, aread=aread)
 
-    params = {
-        'airport': 'EDDF',
-        'begin': 1517227200,
-        'end': 1517230800
-    }
-    flight_departures = client.get_flight_departures(**params)
+    return SimpleNamespace(stream=stream, calls=calls)
 
-    assert expected_flight_departures_list == flight_departures
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['airport'] == params['airport']
-    assert call_args['params']['begin'] == params['begin']
-    assert call_args['params']['end'] == params['end']
+def test_async_client__iter_state_vectors__state_vectors_are_yielded_from_the_streamed_response(states_payload):
+    pytest.importorskip('ijson')
+    states_dict, expected_states = states_payload
 
+    request_handler = _make_async_stream_request_handler(200, orjson.dumps(states_dict))
 
-def test_get_flight_departures__json_true__flight_departures_dict_is_returned():
-    flight_departures_dict_list, _ = make_flight_connection_list()
+    client = AsyncOpenskyNetworkClient(request_handler=request_handler)
 
-    response = Mock()
-    response.status_code = 200
-    response.content = flight_departures_dict_list
-    response.json = Mock(return_value=flight_departures_dict_list)
+    async def collect():
+        return [state_vector async for state_vector in client.iter_state_vectors(timestamp=1458564121)]
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    assert list(expected_states.states) == asyncio.run(collect())
+    method, _, kwargs = request_handler.calls[-1]
+    assert 'GET' == method
+    assert 1458564121 == kwargs['params']['time']
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
 
-    params = {
-        'airport': 'EDDF',
-        'begin': 1517227200,
-        'end': 1517230800,
-        'json': True
-    }
-    flight_departures = client.get_flight_departures(**params)
+@pytest.mark.parametrize('error_code', [400, 401, 403, 404, 500])
+def test_async_client__iter_state_vectors__http_error_code__raises_api_error(error_code):
+    pytest.importorskip('ijson')
+    request_handler = _make_async_stream_request_handler(error_code, b'')
 
-    assert flight_departures_dict_list == flight_departures
+    client = AsyncOpenskyNetworkClient(request_handler=request_handler)
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['airport'] == params['airport']
-    assert call_args['params']['begin'] == params['begin']
-    assert call_args['params']['end'] == params['end']
+    async def collect():
+        return [state_vector async for state_vector in client.iter_state_vectors()]
 
+    with pytest.raises(APIError):
+        asyncio.run(collect())
 
-def test_get_flight_departures__with_begin_end_datetime__is_converted_to_int_and_flight_departures_object_is_returned():
-    flight_departures_dict_list, expected_flight_departures_list = make_flight_connection_list()
 
-    response = Mock()
-    response.status_code = 200
-    response.content = flight_departures_dict_list
-    response.json = Mock(return_value=flight_departures_dict_list)
+def test_get_flight_arrivals__same_time_window__response_is_memoized_until_cache_is_cleared(flight_connections_payload,
+                                                                                            mock_response,
+                                                                                            request_handler, client):
+    flight_arrivals_dict_list, expected_flight_arrivals_list = flight_connections_payload
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    request_handler.get.return_value = mock_response(flight_arrivals_dict_list)
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
+    flight_arrivals = client.get_flight_arrivals(airport='EDDF', begin=1517227200, end=1517230800)
+    flight_arrivals.clear()
 
-    timestamp = datetime.now()
-    params = {
-        'airport': 'EDDF',
-        'begin': timestamp,
-        'end': timestamp
-    }
-    flight_departures = client.get_flight_departures(**params)
+    assert expected_flight_arrivals_list == client.get_flight_arrivals(airport='EDDF', begin=1517227200,
+                                                                       end=1517230800)
+    assert 1 == len(request_handler.get.calls)
 
-    assert expected_flight_departures_list == flight_departures
+    client.get_flight_departures(airport='EDDF', begin=1517227200, end=1517230800)
+    assert 2 == len(request_handler.get.calls)
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['airport'] == params['airport']
-    assert call_args['params']['begin'] == int(params['begin'].timestamp())
-    assert call_args['params']['end'] == int(params['end'].timestamp())
+    client.clear_cache()
 
+    assert expected_flight_arrivals_list == client.get_flight_arrivals(airport='EDDF', begin=1517227200,
+                                                                       end=1517230800)
+    assert 3 == len(request_handler.get.calls)
 
-@pytest.mark.parametrize('error_code', [400, 401, 403, 404, 500])
-def test_get_airport__http_error_code__raises_api_error(error_code):
-    response = Mock()
-    response.status_code = error_code
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+@pytest.mark.parametrize('json', [True, False])
+def test_get_flight_arrivals__same_past_time_window__memoized_objects_are_not_shared(json, flight_connections_payload,
+                                                                                     mock_response, request_handler,
+                                                                                     client):
+    flight_arrivals_dict_list, _ = flight_connections_payload
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
+    request_handler.get.return_value = mock_response(flight_arrivals_dict_list)
 
-    with pytest.raises(APIError):
-        client.get_airport(icao='EDDF')
+    flight_arrivals = client.get_flight_arrivals(airport='EDDF', begin=1517227200, end=1517230800, json=json)
+    flight_arrivals_again = client.get_flight_arrivals(airport='EDDF', begin=1517227200, end=1517230800, json=json)
 
+    assert flight_arrivals == flight_arrivals_again
+    assert all(flight_arrival is not flight_arrival_again
+               for flight_arrival, flight_arrival_again in zip(flight_arrivals, flight_arrivals_again))
+    assert 1 == len(request_handler.get.calls)
 
-def test_get_airport__airport_object_is_returned():
-    airport_dict, expected_airport = make_airport()
 
-    response = Mock()
-    response.status_code = 200
-    response.content = airport_dict
-    response.json = Mock(return_value=airport_dict)
+def test_get_flight_arrivals__time_window_ending_in_the_future__response_is_not_memoized(flight_connections_payload,
+                                                                                         mock_response,
+                                                                                         request_handler, client):
+    flight_arrivals_dict_list, expected_flight_arrivals_list = flight_connections_payload
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+    request_handler.get.return_value = mock_response(flight_arrivals_dict_list)
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
+    begin = int(time.time())
+    end = begin + 3600
 
-    params = {
-        'icao': 'EDDF'
-    }
-    airport = client.get_airport(**params)
+    assert expected_flight_arrivals_list == client.get_flight_arrivals(airport='EDDF', begin=begin, end=end)
+    assert expected_flight_arrivals_list == client.get_flight_arrivals(airport='EDDF', begin=begin, end=end)
+    assert 2 == len(request_handler.get.calls)
 
-    assert expected_airport == airport
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['icao'] == params['icao']
+@pytest.mark.parametrize('json', [True, False])
+@pytest.mark.parametrize('end_offset', [-3600, 3600])
+def test_get_flight_arrivals__empty_response_content__returns_none_whether_memoized_or_not(json, end_offset,
+                                                                                           mock_response,
+                                                                                           request_handler, client):
+    request_handler.get.return_value = mock_response(None, status_code=204)
 
+    end = int(time.time()) + end_offset
 
-def test_get_airport__json_true__airport_dict_is_returned():
-    airport_dict, _ = make_airport()
+    assert client.get_flight_arrivals(airport='EDDF', begin=end - 7200, end=end, json=json) is None
+    assert client.get_flight_arrivals(airport='EDDF', begin=end - 7200, end=end, json=json) is None
 
-    response = Mock()
-    response.status_code = 200
-    response.content = airport_dict
-    response.json = Mock(return_value=airport_dict)
 
-    request_handler = Mock()
-    request_handler.get = Mock(return_value=response)
+def test_async_client__create__client_is_built_on_an_httpx_async_client():
+    httpx = pytest.importorskip('httpx')
+
+    client = AsyncOpenskyNetworkClient.create('opensky-network.org', timeout=10, username='user', password='secret',
+                                              http2=False)
+
+    assert isinstance(client._request_handler, httpx.AsyncClient)
+    assert 'https://opensky-network.org/' == str(client._request_handler.base_url)
+    assert 10 == client._request_handler.timeout.read
+
+    asyncio.run(client._request_handler.aclose())
+
+
+def test_async_client__clear_cache__is_not_exposed():
+    client = AsyncOpenskyNetworkClient(request_handler=SimpleNamespace())
+
+    assert not hasattr(client, 'clear_cache')
+    assert not hasattr(client, '_flight_connections_cache')
 
-    client = OpenskyNetworkClient(request_handler=request_handler)
 
-    params = {
-        'icao': 'EDDF',
-        'json': True
-    }
-    airport = client.get_airport(**params)
+def test_get_flight_departures__with_begin_end_utc_datetime__is_converted_to_int(mock_response, request_handler,
+                                                                                 client):
+    request_handler.get.return_value = mock_response([])
 
-    assert airport_dict == airport
+    client.get_flight_departures(airport='EDDF',
+                                 begin=datetime(2018, 1, 29, 12, tzinfo=timezone.utc),
+                                 end=datetime(2018, 1, 29, 13, tzinfo=timezone.utc))
 
-    call_args = request_handler.get.call_args[1]
-    assert call_args['params']['icao'] == params['icao']
\ No newline at end of file
+    assert_params_subset(request_handler, {'begin': 1517227200, 'end': 1517230800})
@@ -32,72 +32,94 @@ from opensky_network_client.models import PositionSource, StateVector, States, F
 __author__ = "EUROCONTROL (SWIM)"
 
 
+class Recorder:
+    """
+    Lightweight replacement of Mock for callables of which only the calls and the returned value matter.
+    """
+
+    def __init__(self, return_value=None):
+        self.return_value = return_value
+        self.calls = []
+
+    def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+
+        return self.return_value
+
+
+def assert_params_subset(request_handler, expected_params):
+    """
+    Asserts that the last GET request of the handler was sent with at least the expected query parameters.
+    """
+    params = request_handler.get.calls[-1][1]['params']
+
+    assert expected_params == {key: params[key] for key in expected_params}
+
+
+# The payloads and models are built once at import and shared by the make_* helpers, so they must not be modified by
+# the tests.
+_STATES_DICT = {
+    "time": 1458564121,
+    "states": [
+        ["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26, 4.55,
+         None, 9547.86, "1000", False, PositionSource.ASD_B.value],
+        ["4b1806", "DLH9LF ", "Greece", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26, 4.55,
+         None, 9547.86, "1000", False, PositionSource.ASD_B.value]
+    ]
+}
+_STATES = States.from_json(_STATES_DICT)
+
+_FLIGHT_CONNECTION_DICT = {
+    "icao24": "0101be",
+    "firstSeen": 1517220729,
+    "estDepartureAirport": None,
+    "lastSeen": 1517230737,
+    "estArrivalAirport": "EDDF",
+    "callsign": "MSR785 ",
+    "estDepartureAirportHorizDistance": None,
+    "estDepartureAirportVertDistance": None,
+    "estArrivalAirportHorizDistance": 1593,
+    "estArrivalAirportVertDistance": 95,
+    "departureAirportCandidatesCount": 0,
+    "arrivalAirportCandidatesCount": 2
+}
+_FLIGHT_CONNECTION = FlightConnection.from_json(_FLIGHT_CONNECTION_DICT)
+
+_AIRPORT_DICT = {
+    'icao': 'UUEE',
+    'iata': 'SVO',
+    'name': 'Sheremetyevo International Airport',
+    'city': None,
+    'type': None,
+    'position': {
+        'longitude': 37.4146,
+        'latitude': 55.972599,
+        'altitude': 189.5856,
+        'reasonable': True,
+    },
+    'continent': 'EU',
+    'country': 'RU',
+    'region': 'RU-MOS',
+    'municipality': 'Moscow',
+    'gpsCode': 'UUEE',
+    'homepage': 'http://www.svo.aero/en/',
+    'wikipedia': 'http://en.wikipedia.org/wiki/Sheremetyevo_International_Airport'
+}
+_AIRPORT = Airport.from_json(_AIRPORT_DICT)
+
+
 def make_states():
-    states_dict = {
-            "time": 1458564121,
-            "states": [
-                ["3c6444", "DLH9LF ", "Germany", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
-                 4.55, None, 9547.86, "1000", False, PositionSource.ASD_B],
-                ["4b1806", "DLH9LF ", "Greece", 1458564120, 1458564120, 6.1546, 50.1964, 9639.3, False, 232.88, 98.26,
-                 4.55, None, 9547.86, "1000", False, PositionSource.ASD_B]
-            ]
-        }
-
-    states = States.from_json(states_dict)
-
-    return states_dict, states
-
-
-def make_flight_connection(icao24=None):
-    flight_connection_dict = {
-            "icao24": icao24 or "0101be",
-            "firstSeen": 1517220729,
-            "estDepartureAirport": None,
-            "lastSeen": 1517230737,
-            "estArrivalAirport": "EDDF",
-            "callsign": "MSR785 ",
-            "estDepartureAirportHorizDistance": None,
-            "estDepartureAirportVertDistance": None,
-            "estArrivalAirportHorizDistance": 1593,
-            "estArrivalAirportVertDistance": 95,
-            "departureAirportCandidatesCount": 0,
-            "arrivalAirportCandidatesCount": 2
-        }
-
-    flight_connection = FlightConnection.from_json(flight_connection_dict)
-
-    return flight_connection_dict, flight_connection
+    return _STATES_DICT, _STATES
+
+
+def make_flight_connection():
+    return _FLIGHT_CONNECTION_DICT, _FLIGHT_CONNECTION
 
 
 def make_airport():
-    airport_dict = {
-        'icao': 'UUEE',
-        'iata': 'SVO',
-        'name': 'Sheremetyevo International Airport',
-        'city': None,
-        'type': None,
-        'position': {
-            'longitude': 37.4146,
-            'latitude': 55.972599,
-            'altitude': 189.5856,
-            'reasonable': True,
-        },
-        'continent': 'EU',
-        'country': 'RU',
-        'region': 'RU-MOS',
-        'municipality': 'Moscow',
-        'gpsCode': 'UUEE',
-        'homepage': 'http://www.svo.aero/en/',
-        'wikipedia': 'http://en.wikipedia.org/wiki/Sheremetyevo_International_Airport'
-    }
-
-    airport = Airport.from_json(airport_dict)
-
-    return airport_dict, airport
+    return _AIRPORT_DICT, _AIRPORT
 
 
 def make_flight_connection_list():
-    flight_connection_dict1, flight_connection1 = make_flight_connection()
-    flight_connection_dict2, flight_connection2 = make_flight_connection(icao24="0101be")
-
-    return [flight_connection_dict1, flight_connection_dict2], [flight_connection1, flight_connection2]
+    # both entries are the same flight connection
+    return [_FLIGHT_CONNECTION_DICT, _FLIGHT_CONNECTION_DICT], [_FLIGHT_CONNECTION, _FLIGHT_CONNECTION]